@@ -0,0 +1,170 @@
+from typing import Callable
+
+import numpy as np
+
+from game import correct_tile_fitness, win_bonus, move_penalty, move_limit, already_revealed_penalty
+from neighbors import get_neighbor_table
+
+# Tile reported to on_moves for boards whose move only ran out the move limit.
+no_tile = -1
+
+
+class BatchGame:
+    """ Steps many Minesweeper boards of the same shape at once using stacked NumPy arrays.
+
+    Every per-tile array is (boards, rows * columns), laid out row-major in the same order Game feeds
+    tiles to the net, so a flat index c maps to tile (c // columns, c % columns). `fitness` holds the
+    value each Game would report through on_game_over.
+    """
+
+    def __init__(self, rows, columns, bomb_mask, touching=None, revealed=None):
+        """ touching and revealed may be passed in precomputed (see TrainingSet), in which case revealed
+        is taken as the state after the opening move and click_random is skipped. """
+        self.rows = rows
+        self.columns = columns
+        self.num_boards = len(bomb_mask)
+        self.neighbors = get_neighbor_table(rows, columns)
+        self.bombs = np.asarray(bomb_mask, dtype=bool).reshape(self.num_boards, rows * columns)
+        if touching is None:
+            touching = self.count_touching(self.bombs, self.neighbors)
+        self.touching = np.asarray(touching, dtype=np.int8).reshape(self.num_boards, rows * columns)
+        self.flagged = np.zeros_like(self.bombs)
+        self.safe_tiles = rows * columns - self.bombs.sum(axis=1)
+        self.revealed_safe = np.zeros(self.num_boards, dtype=np.int64)
+        self.moves = np.zeros(self.num_boards, dtype=np.int32)
+        self.fitness = np.zeros(self.num_boards, dtype=np.float64)
+        self.game_over = np.zeros(self.num_boards, dtype=bool)
+
+        if revealed is None:
+            self.revealed = np.zeros_like(self.bombs)
+            self.click_random()
+        else:
+            self.revealed = np.array(revealed, dtype=bool).reshape(self.num_boards, rows * columns)
+            self.revealed_safe = (self.revealed & ~self.bombs).sum(axis=1)
+
+    def click_random(self):
+        zeros = self.touching == 0
+        boards = np.flatnonzero(zeros.any(axis=1))
+        self.reveal_from(boards, np.argmax(zeros[boards], axis=1))
+
+    def live_boards(self):
+        return np.flatnonzero(~self.game_over)
+
+    def get_visible_states(self, boards):
+        return np.where(self.revealed[boards], self.touching[boards], -1)
+
+    def activate_net(self, get_outputs: Callable[[np.ndarray, np.ndarray], np.ndarray], stop_at_fixed_points=False,
+                     on_moves=None, select_moves=None):
+        """ Plays one move on every live board.
+
+        get_outputs receives the playing board indices and their visible states and returns one row
+        of net outputs per board. With stop_at_fixed_points, get_outputs must be deterministic in the
+        visible state: a board whose move revealed nothing would then repeat that move until
+        move_limit, so its remaining moves are scored in closed form and the board is finished.
+
+        on_moves, if given, is called with every board that was live, the tile it clicked (no_tile for
+        boards that ran out of moves) and the fitness the move added. select_moves (e.g. a MoveSelector)
+        turns the outputs and revealed and flagged masks into tiles; by default the first highest
+        output is clicked.
+        """
+        live = self.live_boards()
+        live_fitness = self.fitness[live]
+        clicked = np.full(len(live), no_tile, dtype=np.int64)
+        self.moves[live] += 1
+        self.fitness[live] += move_penalty
+        expired = self.moves[live] > move_limit
+        self.game_over[live[expired]] = True
+        boards = live[~expired]
+
+        if len(boards):
+            start_fitness = live_fitness[~expired]
+            start_revealed = self.revealed_safe[boards]
+            output = np.asarray(get_outputs(boards, self.get_visible_states(boards)))
+            if select_moves is None:
+                tiles = np.argmax(output, axis=1)
+            else:
+                tiles = select_moves(output, self.revealed[boards], self.flagged[boards])
+            clicked[~expired] = tiles
+            self.handle_tile_click(boards, tiles)
+
+            if stop_at_fixed_points:
+                stuck = ~self.game_over[boards] & (self.revealed_safe[boards] == start_revealed)
+                boards = boards[stuck]
+                move_fitness = self.fitness[boards] - start_fitness[stuck]
+                # Each repeat scores move_fitness; the game then reports after the next move's penalty.
+                self.fitness[boards] += (move_limit - self.moves[boards]) * move_fitness + move_penalty
+                self.moves[boards] = move_limit + 1
+                self.game_over[boards] = True
+
+        if on_moves is not None:
+            on_moves(live, clicked, self.fitness[live] - live_fitness)
+
+    def handle_tile_click(self, boards, tiles):
+        zero = self.touching[boards, tiles] == 0
+        if zero.any():
+            revealed_count = self.reveal_from(boards[zero], tiles[zero])
+            self.fitness[boards[zero]] += correct_tile_fitness * revealed_count
+
+        already_revealed = self.revealed[boards, tiles]
+        self.fitness[boards[already_revealed]] += already_revealed_penalty
+
+        clicked = ~already_revealed & ~self.flagged[boards, tiles]
+        self.revealed[boards[clicked], tiles[clicked]] = True
+        bomb = self.bombs[boards, tiles]
+        # Game reports its fitness from reveal_all before bomb_penalty is added, so the penalty
+        # never reaches the genome.
+        self.reveal_all(boards[clicked & bomb])
+        self.fitness[boards[clicked & ~bomb]] += correct_tile_fitness
+        self.revealed_safe[boards[clicked & ~bomb]] += 1
+
+        self.check_game_win(boards[~(clicked & bomb)])
+
+    def reveal_from(self, boards, tiles):
+        """ Flood-reveals the neighbors of each board's tile, returning how many tiles were revealed.
+
+        Only the frontier is expanded through the neighbor table, so the cost follows the size of the
+        revealed region rather than the board.
+        """
+        num_tiles = self.rows * self.columns
+        start_boards = boards
+        counts = np.zeros(self.num_boards, dtype=np.int64)
+        while len(tiles):
+            candidate_boards = np.repeat(boards, 8)
+            candidate_tiles = self.neighbors[tiles].ravel()
+            inside = candidate_tiles < num_tiles
+            candidate_boards = candidate_boards[inside]
+            candidate_tiles = candidate_tiles[inside]
+            hidden = ~(self.revealed[candidate_boards, candidate_tiles] | self.flagged[candidate_boards, candidate_tiles])
+            keys = np.unique(candidate_boards[hidden] * num_tiles + candidate_tiles[hidden])
+            boards, tiles = np.divmod(keys, num_tiles)
+
+            self.revealed[boards, tiles] = True
+            counts += np.bincount(boards, minlength=self.num_boards)
+            zero = self.touching[boards, tiles] == 0
+            boards = boards[zero]
+            tiles = tiles[zero]
+
+        # Flooding only ever spreads out of zero tiles, so everything it reveals is safe.
+        self.revealed_safe += counts
+        return counts[start_boards]
+
+    def reveal_all(self, boards):
+        self.revealed[boards] = True
+        self.game_over[boards] = True
+
+    def check_game_win(self, boards):
+        winners = boards[self.revealed_safe[boards] == self.safe_tiles[boards]]
+        self.fitness[winners] += win_bonus
+        self.game_over[winners] = True
+
+    def flag(self, boards, tiles):
+        hidden = ~self.revealed[boards, tiles]
+        self.flagged[boards[hidden], tiles[hidden]] ^= True
+
+    @staticmethod
+    def count_touching(bombs, neighbors):
+        padded = np.zeros((len(bombs), bombs.shape[1] + 1), dtype=np.int8)
+        padded[:, :-1] = bombs
+        touching = padded[:, neighbors].sum(axis=2, dtype=np.int8)
+        touching[bombs] = -1
+        return touching
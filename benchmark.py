@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import timeit
+
+import neat
+import numpy as np
+
+from evaluator import ProcessEvaluator, play_genomes
+from game import Game
+from layouts import generate_layouts, get_bomb_lists
+from training_set import TrainingSet
+
+local_dir = os.path.dirname(os.path.abspath(__file__))
+config_path = os.path.join(local_dir, 'config.txt')
+patch_config_path = os.path.join(local_dir, 'config-patch.txt')
+seed = 0
+
+board_sizes = [(5, 5, 5), (9, 9, 10), (16, 16, 40), (30, 16, 99), (100, 100, 1000), (300, 300, 9000)]
+# Boards the nets are played on; fully connected genomes grow with the square of the tile count.
+net_board_sizes = [(5, 5, 5), (9, 9, 10), (16, 16, 40), (30, 16, 99)]
+net_board_genomes = 4
+# Boards patch nets (see patches.py) are played on; their genomes stay the same size on every board.
+patch_board_sizes = [(5, 5, 5), (9, 9, 10), (16, 16, 40), (30, 16, 99), (100, 100, 1000)]
+populations = [16, 64, 256]
+worker_counts = [1, 2, 4, 8]
+training_size = 20
+
+
+def bench_move(rows, columns, bombs, number=20000):
+    """ Returns the seconds per handle_tile_click on a revealed tile, i.e. the bookkeeping cost of a move. """
+    random.seed(seed)
+    bomb_list = Game.get_random_bomb_list(rows, columns, bombs)
+    game = Game(rows, columns, 0, None, 512, bomb_list, lambda *args: None)
+    x, y = next((x, y) for x in range(rows) for y in range(columns)
+                if not game.tiles[x][y].is_bomb and game.tiles[x][y].touching != 0)
+    tile = game.tiles[x][y]
+    game.handle_tile_click(tile, x, y)
+    return timeit.timeit(lambda: game.handle_tile_click(tile, x, y), number=number) / number
+
+
+def bench_opening(rows, columns, bombs, number=3):
+    """ Returns the seconds to build a Game, which floods the opening region from the first zero tile. """
+    random.seed(seed)
+    bomb_list = Game.get_random_bomb_list(rows, columns, bombs)
+    return timeit.timeit(lambda: Game(rows, columns, 0, None, 512, bomb_list, lambda *args: None),
+                         number=number) / number
+
+
+def get_config(rows, columns):
+    """ Loads config.txt with the net's inputs and outputs resized to a rows x columns board. """
+    config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                         neat.DefaultStagnation, config_path)
+    genome_config = config.genome_config
+    genome_config.num_inputs = genome_config.num_outputs = rows * columns
+    genome_config.input_keys = [-i - 1 for i in range(rows * columns)]
+    genome_config.output_keys = list(range(rows * columns))
+    return config
+
+
+def get_patch_config():
+    return neat.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                       neat.DefaultStagnation, patch_config_path)
+
+
+def get_genomes(config, count):
+    """ Returns count new genomes, the same ones on every run. """
+    random.seed(seed)
+    genomes = []
+    for key in range(count):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        genomes.append(genome)
+    return genomes
+
+
+def get_training_set(rows, columns, bombs):
+    return TrainingSet.create(rows, columns, generate_layouts(rows, columns, bombs, training_size, seed=seed))
+
+
+def bench_net_moves(rows, columns, bombs, genomes, config):
+    """ Returns moves per second of Game.activate_net with a FeedForwardNetwork, over whole games. """
+    training_set = get_training_set(rows, columns, bombs)
+    games = []
+    for genome in genomes:
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
+        for board, bomb_list in enumerate(get_bomb_lists(training_set.bombs, columns)):
+            games.append(Game(rows, columns, board, net, 512, bomb_list, lambda *args: None))
+
+    moves = 0
+    start = time.perf_counter()
+    for game in games:
+        while not game.game_over:
+            game.activate_net()
+            moves += 1
+    return moves / (time.perf_counter() - start)
+
+
+def bench_evaluation(rows, columns, bombs, genomes, config, num_workers=0, number=3, patches=False):
+    """ Returns the best seconds over number generations to evaluate genomes on a training set.
+
+    num_workers=0 evaluates serially with play_genomes; otherwise a ProcessEvaluator is used, with
+    its pool started before timing. With patches, genomes of a patch config are played as PatchNetworks.
+    """
+    training_set = get_training_set(rows, columns, bombs)
+    if num_workers == 0:
+        return min(timeit.repeat(lambda: play_genomes(genomes, config, training_set, patches=patches), number=1,
+                                 repeat=number))
+
+    evaluator = ProcessEvaluator(num_workers, config, training_set, patches=patches)
+    try:
+        return min(timeit.repeat(lambda: evaluator.play(genomes), number=1, repeat=number))
+    finally:
+        evaluator.close()
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=local_dir, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(max_workers=None):
+    """ Runs every benchmark, returning the results as a list of dicts that each hold one measured value. """
+    max_workers = max_workers or os.cpu_count()
+    results = []
+
+    def add(name, unit, value, **params):
+        results.append({'name': name, **params, 'value': value, 'unit': unit})
+        print(name, params, f"{value:.6g} {unit}")
+
+    for rows, columns, bombs in board_sizes:
+        board = {'board': f"{rows}x{columns}", 'bombs': bombs}
+        add('game_construction', 's', bench_opening(rows, columns, bombs), **board)
+        add('tile_click', 's', bench_move(rows, columns, bombs), **board)
+
+    for rows, columns, bombs in net_board_sizes:
+        board = {'board': f"{rows}x{columns}", 'bombs': bombs}
+        config = get_config(rows, columns)
+        genomes = get_genomes(config, net_board_genomes)
+        add('game_moves', 'moves/s', bench_net_moves(rows, columns, bombs, genomes, config), **board)
+        seconds = bench_evaluation(rows, columns, bombs, genomes, config)
+        add('evaluation', 'genomes/s', len(genomes) / seconds, **board, population=len(genomes), workers=0)
+
+    config = get_patch_config()
+    genomes = get_genomes(config, net_board_genomes)
+    for rows, columns, bombs in patch_board_sizes:
+        seconds = bench_evaluation(rows, columns, bombs, genomes, config, patches=True)
+        add('evaluation', 'genomes/s', len(genomes) / seconds, board=f"{rows}x{columns}", bombs=bombs,
+            population=len(genomes), workers=0, net='patch')
+
+    rows, columns, bombs = board_sizes[0]
+    config = get_config(rows, columns)
+    for population in populations:
+        genomes = get_genomes(config, population)
+        for num_workers in [0] + [n for n in worker_counts if n <= max_workers]:
+            seconds = bench_evaluation(rows, columns, bombs, genomes, config, num_workers)
+            add('evaluation', 'genomes/s', population / seconds, board=f"{rows}x{columns}", bombs=bombs,
+                population=population, workers=num_workers)
+    return results
+
+
+def get_result_key(result):
+    return tuple(sorted((k, v) for k, v in result.items() if k not in ('value', 'unit')))
+
+
+def compare(old_path, new_path):
+    """ Prints the new / old ratio of every result the two files share. """
+    with open(old_path) as f:
+        old = {get_result_key(result): result for result in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+    for result in new:
+        previous = old.get(get_result_key(result))
+        if previous is not None:
+            params = ", ".join(f"{k}={v}" for k, v in get_result_key(result))
+            print(f"{params}: {previous['value']:.6g} -> {result['value']:.6g} {result['unit']} "
+                  f"({result['value'] / previous['value']:.2f}x)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the simulator and evaluator with fixed seeds.")
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--max-workers', type=int, default=None)
+    parser.add_argument('--compare', metavar='OLD_RESULTS', help="compare --output against an earlier results file")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare, args.output)
+    else:
+        report = {'commit': get_commit(), 'python': platform.python_version(), 'numpy': np.__version__,
+                  'machine': platform.platform(), 'cpus': os.cpu_count(), 'seed': seed,
+                  'results': run_suite(args.max_workers)}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,44 @@
+from array import array
+
+
+class Board:
+    """ The tile state of one board as flat byte planes, indexed x * columns + y like BatchGame.
+
+    bombs, revealed and flagged hold one byte per tile and touching a signed byte (-1 on bombs),
+    so a board takes four bytes per tile instead of a Python object per tile. The bomb and touching
+    planes never change during a game; snapshot() and restore() only copy revealed and flagged.
+    """
+
+    __slots__ = ('rows', 'columns', 'bombs', 'touching', 'revealed', 'flagged')
+
+    def __init__(self, rows, columns, bombs=None, touching=None, revealed=None, flagged=None):
+        num_tiles = rows * columns
+        self.rows = rows
+        self.columns = columns
+        self.bombs = bytearray(num_tiles) if bombs is None else bombs
+        self.touching = array('b', bytes(num_tiles)) if touching is None else touching
+        self.revealed = bytearray(num_tiles) if revealed is None else revealed
+        self.flagged = bytearray(num_tiles) if flagged is None else flagged
+
+    def set_bombs(self, bomb_list, neighbors):
+        """ Places bombs at the [x, y] tiles of bomb_list and counts touching bombs with the flat neighbor lists. """
+        for x, y in bomb_list:
+            self.bombs[x * self.columns + y] = 1
+        bombs = self.bombs
+        self.touching = array('b', [-1 if bombs[i] else sum(bombs[j] for j in neighbors[i])
+                                    for i in range(len(bombs))])
+
+    def get_visible_state(self):
+        return [touching if revealed else -1 for touching, revealed in zip(self.touching, self.revealed)]
+
+    def copy(self):
+        # The static planes are shared, as nothing writes to them after set_bombs.
+        return Board(self.rows, self.columns, self.bombs, self.touching, self.revealed[:], self.flagged[:])
+
+    def snapshot(self):
+        return bytes(self.revealed) + bytes(self.flagged)
+
+    def restore(self, snapshot):
+        num_tiles = len(self.revealed)
+        self.revealed[:] = snapshot[:num_tiles]
+        self.flagged[:] = snapshot[num_tiles:]
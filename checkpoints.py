@@ -0,0 +1,207 @@
+import io
+import json
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import neat
+import numpy as np
+from neat.reporting import ReporterSet
+from neat.species import Species
+
+
+def get_gene_columns(genes, gene_type, prefix):
+    """ Returns one array per gene attribute (bias, weight, activation, ...) of genes, named prefix + attribute. """
+    return {prefix + a.name: np.array([getattr(gene, a.name) for gene in genes])
+            for a in gene_type._gene_attributes}
+
+
+def get_genome_columns(genomes, genome_config):
+    """ Flattens genomes into columns: one row per genome, node and connection, genes grouped by genome. """
+    nodes = [gene for genome in genomes for gene in genome.nodes.values()]
+    connections = [gene for genome in genomes for gene in genome.connections.values()]
+    columns = {
+        'genome_key': np.array([genome.key for genome in genomes], dtype=np.int64),
+        'genome_fitness': np.array([np.nan if genome.fitness is None else genome.fitness for genome in genomes]),
+        'genome_nodes': np.array([len(genome.nodes) for genome in genomes], dtype=np.int64),
+        'genome_connections': np.array([len(genome.connections) for genome in genomes], dtype=np.int64),
+        'node_key': np.array([gene.key for gene in nodes], dtype=np.int64),
+        'connection_in': np.array([gene.key[0] for gene in connections], dtype=np.int64),
+        'connection_out': np.array([gene.key[1] for gene in connections], dtype=np.int64),
+    }
+    columns.update(get_gene_columns(nodes, genome_config.node_gene_type, 'node_'))
+    columns.update(get_gene_columns(connections, genome_config.connection_gene_type, 'connection_'))
+    return columns
+
+
+def split_genomes(columns):
+    """ Returns each genome's own rows of columns, keyed by genome key. """
+    node_ends = np.cumsum(columns['genome_nodes'])
+    connection_ends = np.cumsum(columns['genome_connections'])
+    genomes = {}
+    for i, key in enumerate(columns['genome_key']):
+        nodes = slice(node_ends[i] - columns['genome_nodes'][i], node_ends[i])
+        connections = slice(connection_ends[i] - columns['genome_connections'][i], connection_ends[i])
+        rows = {}
+        for name, values in columns.items():
+            if name.startswith('genome_'):
+                rows[name] = values[i:i + 1]
+            elif name.startswith('node_'):
+                rows[name] = values[nodes]
+            else:
+                rows[name] = values[connections]
+        genomes[int(key)] = rows
+    return genomes
+
+
+def create_genomes(columns, config):
+    genome_config = config.genome_config
+    node_type = genome_config.node_gene_type
+    connection_type = genome_config.connection_gene_type
+    genomes = {}
+    for key, rows in split_genomes(columns).items():
+        genome = config.genome_type(key)
+        fitness = rows['genome_fitness'][0]
+        genome.fitness = None if np.isnan(fitness) else float(fitness)
+        for i, node_key in enumerate(rows['node_key'].tolist()):
+            gene = node_type(node_key)
+            for a in node_type._gene_attributes:
+                setattr(gene, a.name, rows['node_' + a.name][i].item())
+            genome.nodes[node_key] = gene
+        for i, connection_key in enumerate(zip(rows['connection_in'].tolist(), rows['connection_out'].tolist())):
+            gene = connection_type(connection_key)
+            for a in connection_type._gene_attributes:
+                setattr(gene, a.name, rows['connection_' + a.name][i].item())
+            genome.connections[connection_key] = gene
+        genomes[key] = genome
+    return genomes
+
+
+class ColumnarCheckpointer(neat.reporting.BaseReporter):
+    """ A drop-in for neat.Checkpointer that writes compact checkpoints on a background thread.
+
+    Genomes are stored as compressed columns (one array per gene attribute) in an .npz file, each
+    checkpoint on its own. end_generation only copies the population into columns; compressing and
+    writing happen on one background thread, in order. Call close() (or let the interpreter exit)
+    to wait for pending writes.
+    """
+
+    def __init__(self, generation_interval=100, time_interval_seconds=300, filename_prefix='neat-checkpoint-'):
+        self.generation_interval = generation_interval
+        self.time_interval_seconds = time_interval_seconds
+        self.filename_prefix = filename_prefix
+
+        self.current_generation = None
+        self.last_generation_checkpoint = -1
+        self.last_time_checkpoint = time.time()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+
+    def __getstate__(self):
+        # A thread pool can't be pickled, and neat.Checkpointer pickles the species set's reporters too.
+        state = self.__dict__.copy()
+        state.update(executor=None, pending=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def start_generation(self, generation):
+        self.current_generation = generation
+
+    def end_generation(self, config, population, species_set):
+        checkpoint_due = False
+
+        if self.time_interval_seconds is not None:
+            dt = time.time() - self.last_time_checkpoint
+            if dt >= self.time_interval_seconds:
+                checkpoint_due = True
+
+        if (checkpoint_due is False) and (self.generation_interval is not None):
+            dg = self.current_generation - self.last_generation_checkpoint
+            if dg >= self.generation_interval:
+                checkpoint_due = True
+
+        if checkpoint_due:
+            self.save_checkpoint(config, population, species_set, self.current_generation)
+            self.last_generation_checkpoint = self.current_generation
+            self.last_time_checkpoint = time.time()
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        """ Copies the current simulation state and queues it to be written. """
+        if self.pending is not None:
+            # Surfaces an error from the previous write instead of losing it.
+            self.pending.result()
+
+        representatives = {s.representative.key: s.representative for s in species_set.species.values()}
+        genomes = list(population.values()) + [g for key, g in representatives.items() if key not in population]
+        species = [{'key': s.key, 'created': s.created, 'last_improved': s.last_improved,
+                    'representative': s.representative.key, 'members': list(s.members),
+                    'fitness': s.fitness, 'adjusted_fitness': s.adjusted_fitness,
+                    'fitness_history': s.fitness_history} for s in species_set.species.values()]
+        version, state, gauss_next = random.getstate()
+        meta = {'generation': generation, 'population': list(population), 'species': species,
+                'next_species': max(species_set.species, default=0) + 1,
+                'random_version': version, 'random_gauss_next': gauss_next}
+        columns = get_genome_columns(genomes, config.genome_config)
+        columns['random_state'] = np.array(state, dtype=np.uint32)
+
+        self.pending = self.executor.submit(self.write, f"{self.filename_prefix}{generation}.npz", config, meta,
+                                            columns)
+
+    def write(self, filename, config, meta, columns):
+        print(f"Saving checkpoint to {filename}")
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+                            config=np.frombuffer(pickle.dumps(config), dtype=np.uint8), **columns)
+        with open(filename + '.tmp', 'wb') as f:
+            f.write(buffer.getbuffer())
+        os.replace(filename + '.tmp', filename)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.pending is not None:
+            self.pending.result()
+
+    @staticmethod
+    def load_genomes(filename):
+        """ Returns the config, metadata and genomes stored in a checkpoint. """
+        with np.load(filename) as data:
+            meta = json.loads(data['meta'].tobytes())
+            config = pickle.loads(data['config'].tobytes())
+            columns = {name: data[name] for name in data.files if name not in ('meta', 'config')}
+        genomes = create_genomes({name: values for name, values in columns.items() if name != 'random_state'}, config)
+        meta['random_state'] = columns['random_state']
+        return config, meta, genomes
+
+    @staticmethod
+    def restore_checkpoint(filename):
+        """Resumes the simulation from a previous saved point."""
+        config, meta, genomes = ColumnarCheckpointer.load_genomes(filename)
+        random.setstate((meta['random_version'], tuple(meta['random_state'].tolist()), meta['random_gauss_next']))
+        generation = meta['generation']
+        population = {key: genomes[key] for key in meta['population']}
+
+        species_set = config.species_set_type(config.species_set_config, ReporterSet())
+        species_set.indexer = count(meta['next_species'])
+        for s in meta['species']:
+            species = Species(s['key'], s['created'])
+            species.last_improved = s['last_improved']
+            species.representative = genomes[s['representative']]
+            species.members = {key: genomes[key] for key in s['members']}
+            species.fitness = s['fitness']
+            species.adjusted_fitness = s['adjusted_fitness']
+            species.fitness_history = s['fitness_history']
+            species_set.species[species.key] = species
+            for key in s['members']:
+                species_set.genome_to_species[key] = species.key
+
+        restored = neat.Population(config, (population, species_set, generation))
+        species_set.reporters = restored.reporters
+        # neat.Checkpointer restarts genome keys at 1, clashing with the restored genomes; continue after them.
+        restored.reproduction.genome_indexer = count(max(genomes) + 1)
+        return restored
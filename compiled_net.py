@@ -0,0 +1,247 @@
+import numpy as np
+
+# Largest (boards, incoming, nodes) product a layer gathers in one go; past it, summing row by row is faster.
+gather_limit = 1 << 16
+
+
+def sigmoid_activation(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def tanh_activation(z):
+    return np.tanh(np.clip(2.5 * z, -60.0, 60.0))
+
+
+def sin_activation(z):
+    return np.sin(np.clip(5.0 * z, -60.0, 60.0))
+
+
+def gauss_activation(z):
+    return np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2)
+
+
+def relu_activation(z):
+    return np.where(z > 0.0, z, 0.0)
+
+
+def softplus_activation(z):
+    return 0.2 * np.log(1 + np.exp(np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def identity_activation(z):
+    return z
+
+
+def clamped_activation(z):
+    return np.clip(z, -1.0, 1.0)
+
+
+def abs_activation(z):
+    return np.abs(z)
+
+
+def hat_activation(z):
+    return np.maximum(0.0, 1 - np.abs(z))
+
+
+def square_activation(z):
+    return z ** 2
+
+
+def cube_activation(z):
+    return z ** 3
+
+
+def maxabs_aggregation(x, axis):
+    return np.take_along_axis(x, np.argmax(np.abs(x), axis=axis)[:, None], axis=axis)[:, 0]
+
+
+def row_function(function):
+    """ Wraps a list-based neat aggregation so it reduces each row of a 2D array. """
+    def aggregate(x, axis):
+        return np.array([function(list(row)) for row in x])
+    return aggregate
+
+
+# NumPy equivalents of the neat-python builtins, matching their clamping.
+activation_functions = {
+    'sigmoid': sigmoid_activation,
+    'tanh': tanh_activation,
+    'sin': sin_activation,
+    'gauss': gauss_activation,
+    'relu': relu_activation,
+    'softplus': softplus_activation,
+    'identity': identity_activation,
+    'clamped': clamped_activation,
+    'abs': abs_activation,
+    'hat': hat_activation,
+    'square': square_activation,
+    'cube': cube_activation,
+}
+
+aggregation_functions = {
+    'product': np.prod,
+    'max': np.max,
+    'min': np.min,
+    'maxabs': maxabs_aggregation,
+    'median': np.median,
+    'mean': np.mean,
+}
+
+
+def get_node_layers(inputs, outputs, connections):
+    """ Returns every node the arguments name, sorted, and the feed-forward layer each is evaluated in.
+
+    A node is used if it is an output or feeds a used node, and is evaluated in the layer after the
+    last of its sources; inputs, unused nodes and nodes with no incoming connection or behind a
+    cycle get -1. connections is a list or (connections, 2) array of (input, output) keys.
+    """
+    inputs = np.asarray(inputs, dtype=np.int64)
+    outputs = np.asarray(outputs, dtype=np.int64)
+    connections = np.asarray(connections, dtype=np.int64).reshape(-1, 2)
+    nodes, index = np.unique(np.concatenate([inputs, outputs, connections.ravel()]), return_inverse=True)
+    is_input = np.zeros(len(nodes), dtype=bool)
+    is_input[index[:len(inputs)]] = True
+    source, target = index[len(inputs) + len(outputs):].reshape(-1, 2).T
+
+    used = np.zeros(len(nodes), dtype=bool)
+    used[index[len(inputs):len(inputs) + len(outputs)]] = True
+    while True:
+        feeds = np.zeros(len(nodes), dtype=bool)
+        feeds[source[used[target]]] = True
+        new = feeds & ~used & ~is_input
+        if not new.any():
+            break
+        used |= new
+
+    layer = np.full(len(nodes), -1)
+    # Incoming connections whose source is not evaluated yet; a node is ready when none are left.
+    waiting = np.bincount(target, minlength=len(nodes))
+    candidates = used & ~is_input & (waiting > 0)
+    evaluated = is_input
+    for k in range(len(nodes)):
+        waiting = waiting - np.bincount(target[evaluated[source]], minlength=len(nodes))
+        ready = candidates & (waiting == 0)
+        if not ready.any():
+            break
+        layer[ready] = k
+        candidates &= ~ready
+        evaluated = ready
+    return nodes, layer
+
+
+def get_layers(inputs, outputs, connections):
+    """ Returns the same layers as neat.graphs.feed_forward_layers (for connections that, as in any genome,
+    never end at an input) without its scan of every connection per candidate node. """
+    nodes, layer = get_node_layers(inputs, outputs, connections)
+    return [set(nodes[layer == k].tolist()) for k in range(layer.max(initial=-1) + 1)]
+
+
+class CompiledNetwork:
+    """ A feed-forward network flattened into index and weight arrays, one set per layer.
+
+    Node values live in the columns of a (boards, columns) matrix: the inputs first, then every
+    evaluated node in layer order, then a constant zero column for outputs that nothing feeds
+    (FeedForwardNetwork leaves those at 0.0). Each layer is a tuple of
+    (start, sources, links, biases, responses, activations, aggregations). Row k of sources and
+    links holds the k-th incoming column and weight of every node in the layer, padded with zero
+    weights, so sums accumulate in the same order as FeedForwardNetwork.activate.
+    """
+
+    def __init__(self, num_inputs, num_columns, output_columns, layers):
+        self.num_inputs = num_inputs
+        self.num_columns = num_columns
+        self.output_columns = output_columns
+        self.layers = layers
+
+    def activate(self, inputs):
+        return self.activate_batch([inputs])[0].tolist()
+
+    def activate_batch(self, states):
+        """ Evaluates one row of inputs per board. NumPy's exp/tanh can differ from math's in the
+        last bit, so outputs match FeedForwardNetwork.activate to within rounding, not exactly. """
+        states = np.asarray(states, dtype=np.float64)
+        if states.shape[1] != self.num_inputs:
+            raise RuntimeError("Expected {0:n} inputs, got {1:n}".format(self.num_inputs, states.shape[1]))
+
+        values = np.zeros((len(states), self.num_columns))
+        values[:, :self.num_inputs] = states
+        for start, sources, links, biases, responses, activations, aggregations in self.layers:
+            if len(states) * sources.size <= gather_limit:
+                # cumsum adds the incoming rows strictly in order, like the loop; sum may pair them up.
+                s = np.cumsum(values[:, sources] * links, axis=1)[:, -1]
+            else:
+                s = np.zeros((len(states), len(biases)))
+                for source, link in zip(sources, links):
+                    s += values[:, source] * link
+            for position, aggregation, columns, links in aggregations:
+                s[:, position] = aggregation(values[:, columns] * links, axis=1)
+
+            z = biases + responses * s
+            for activation, positions in activations:
+                values[:, start + positions] = activation(z[:, positions])
+
+        return values[:, self.output_columns]
+
+    @staticmethod
+    def create(genome, config):
+        """ Receives a genome and returns its compiled phenotype. """
+        genome_config = config.genome_config
+        enabled = [cg for cg in genome.connections.values() if cg.enabled]
+        connections = np.array([cg.key for cg in enabled], dtype=np.int64).reshape(-1, 2)
+        weights = np.array([cg.weight for cg in enabled], dtype=np.float64)
+        nodes, node_layer = get_node_layers(genome_config.input_keys, genome_config.output_keys, connections)
+
+        # Inputs take the first columns in order, then every layer's nodes by key, layer by layer.
+        num_inputs = len(genome_config.input_keys)
+        columns = np.full(len(nodes), -1)
+        columns[np.searchsorted(nodes, genome_config.input_keys)] = np.arange(num_inputs)
+        evaluated = np.flatnonzero(node_layer >= 0)
+        evaluated = evaluated[np.lexsort((nodes[evaluated], node_layer[evaluated]))]
+        columns[evaluated] = num_inputs + np.arange(len(evaluated))
+        source_columns = columns[np.searchsorted(nodes, connections[:, 0])]
+        targets = np.searchsorted(nodes, connections[:, 1])
+
+        compiled_layers = []
+        for k in range(node_layer.max(initial=-1) + 1):
+            layer_nodes = evaluated[node_layer[evaluated] == k]
+            start = columns[layer_nodes[0]]
+            # Each node's incoming connections, grouped by node but otherwise in genome order.
+            incoming = np.flatnonzero(node_layer[targets] == k)
+            incoming = incoming[np.argsort(columns[targets[incoming]], kind='stable')]
+            positions = columns[targets[incoming]] - start
+            counts = np.bincount(positions, minlength=len(layer_nodes))
+            ranks = np.arange(len(incoming)) - np.repeat(np.cumsum(counts) - counts, counts)
+            sources = np.zeros((counts.max(), len(layer_nodes)), dtype=np.intp)
+            links = np.zeros((counts.max(), len(layer_nodes)))
+            sources[ranks, positions] = source_columns[incoming]
+            links[ranks, positions] = weights[incoming]
+
+            node_genes = [genome.nodes[node] for node in nodes[layer_nodes].tolist()]
+            activation_positions = {}
+            aggregations = []
+            for position, ng in enumerate(node_genes):
+                activation_positions.setdefault(ng.activation, []).append(position)
+                if ng.aggregation != 'sum':
+                    aggregation = aggregation_functions.get(ng.aggregation)
+                    if aggregation is None:
+                        aggregation = row_function(genome_config.aggregation_function_defs.get(ng.aggregation))
+                    aggregations.append((position, aggregation, sources[:counts[position], position].copy(),
+                                         links[:counts[position], position].copy()))
+                    links[:, position] = 0.0
+
+            activations = []
+            for name, positions in activation_positions.items():
+                activation = activation_functions.get(name)
+                if activation is None:
+                    activation = np.vectorize(genome_config.activation_defs.get(name), otypes=[np.float64])
+                activations.append((activation, np.array(positions, dtype=np.intp)))
+
+            biases = np.array([ng.bias for ng in node_genes])
+            responses = np.array([ng.response for ng in node_genes])
+            compiled_layers.append((start, sources, links, biases, responses, activations, aggregations))
+
+        zero_column = num_inputs + len(evaluated)
+        output_columns = columns[np.searchsorted(nodes, genome_config.output_keys)]
+        output_columns = np.where(output_columns < 0, zero_column, output_columns).astype(np.intp)
+        return CompiledNetwork(num_inputs, zero_column + 1, output_columns, compiled_layers)
@@ -0,0 +1,107 @@
+import os
+
+import neat
+
+from evaluator import ProcessEvaluator
+from halving import get_fitness_bounds
+from training_set import TrainingSet
+
+
+class Stage:
+    """ One step of a Curriculum: rows x columns boards with bombs bombs each.
+
+    The population moves on to the next stage once its best genome scores at least promote_at of
+    the most any genome could score on the stage's training set.
+    """
+
+    def __init__(self, rows, columns, bombs, promote_at=0.5):
+        self.rows = rows
+        self.columns = columns
+        self.bombs = bombs
+        self.promote_at = promote_at
+
+    def __repr__(self):
+        return f"Stage({self.rows}, {self.columns}, {self.bombs}, promote_at={self.promote_at})"
+
+
+class Curriculum(neat.reporting.BaseReporter):
+    """ Trains on small, cheap boards first and moves on to larger and denser ones as the population improves.
+
+    Use evaluate as the fitness function and add the curriculum as a reporter. Genomes are played as
+    PatchNetworks (see patches.py), so the config must be a patch config such as config-patch.txt,
+    and they carry over between stages unchanged. Each stage has its own saved training set of
+    training_size boards and its own ProcessEvaluator, created when the stage starts. On promotion,
+    every species' fitness history is cleared, so the drop in fitness on the harder boards does not
+    count as stagnation.
+
+    Fitness is not comparable across stages, so the best genome pop.run returns is the best of any
+    stage, usually one of the stage with the most tiles rather than the latest. best_genome is the
+    best genome of the current stage.
+    """
+
+    def __init__(self, stages, training_size=100, seed=0, num_workers=None, training_set_dir='training-sets',
+                 cache=None, move_selector=None, stage=0):
+        self.stages = stages
+        self.training_size = training_size
+        self.seed = seed
+        self.num_workers = num_workers or os.cpu_count()
+        self.training_set_dir = training_set_dir
+        self.cache = cache
+        self.move_selector = move_selector
+        self.stage = stage
+        self.generation = None
+        self.promote = False
+        self.training_set = None
+        self.max_fitness = None
+        self.evaluator = None
+        self.best_genome = None
+        self.start_stage()
+
+    def __getstate__(self):
+        # The evaluator's worker pool can't be pickled; a new one is started on the next evaluate().
+        state = self.__dict__.copy()
+        state['evaluator'] = None
+        return state
+
+    def start_stage(self):
+        stage = self.stages[self.stage]
+        path = os.path.join(self.training_set_dir,
+                            f'{stage.rows}x{stage.columns}-{stage.bombs}-{self.training_size}-{self.seed}')
+        self.training_set = TrainingSet.load_or_create(path, stage.rows, stage.columns, stage.bombs,
+                                                       self.training_size, self.seed)
+        self.max_fitness = get_fitness_bounds(self.training_set)[1].sum()
+        self.best_genome = None
+
+    def evaluate(self, genomes, config):
+        if self.evaluator is None:
+            self.evaluator = ProcessEvaluator(self.num_workers, config, self.training_set, cache=self.cache,
+                                              move_selector=self.move_selector, patches=True)
+        self.evaluator.evaluate(genomes, config)
+
+    def close(self):
+        if self.evaluator is not None:
+            self.evaluator.close()
+            self.evaluator = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.best_genome is None or best_genome.fitness > self.best_genome.fitness:
+            self.best_genome = best_genome
+        stage = self.stages[self.stage]
+        self.promote = (self.stage + 1 < len(self.stages)
+                        and best_genome.fitness >= stage.promote_at * self.max_fitness)
+
+    def end_generation(self, config, population, species_set):
+        # Promoting only after reproduction keeps this generation's fitness out of the new stage's history.
+        if not self.promote:
+            return
+        self.promote = False
+        self.close()
+        self.stage += 1
+        self.start_stage()
+        for species in species_set.species.values():
+            species.fitness_history = []
+            species.last_improved = self.generation
+        print(f"Curriculum promoted to {self.stages[self.stage]} after generation {self.generation}")
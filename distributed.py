@@ -0,0 +1,192 @@
+import argparse
+import math
+import os
+import queue
+import threading
+import time
+import traceback
+from multiprocessing import AuthenticationError, Process
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from evaluator import ProcessEvaluator, play_boards
+
+
+def get_authkey():
+    """ Returns the shared key workers and coordinator authenticate with, from MINESWEEPER_AUTHKEY.
+
+    Connections unpickle whatever they receive, so anyone holding the key can run code on the other
+    end; there is deliberately no default.
+    """
+    authkey = os.environ.get('MINESWEEPER_AUTHKEY')
+    if not authkey:
+        raise RuntimeError("Set MINESWEEPER_AUTHKEY to a secret shared by the coordinator and its workers")
+    return authkey.encode()
+
+
+class DistributedEvaluator(ProcessEvaluator):
+    """ Evaluates genomes on workers that connect over TCP, e.g. from other machines.
+
+    Each worker is sent the config, move selector, patches flag and training set once when it connects
+    (a saved training set only as its path, which must then exist on the worker) and afterwards only
+    chunks of genomes, getting back a (genomes, boards) fitness array per chunk. A worker that
+    disconnects or takes longer than task_timeout on a chunk is dropped and its chunk is handed to
+    another worker. Workers may join at any time; play_boards waits until every chunk came back, and
+    raises if a worker failed to play one, since handing that chunk on would only fail again.
+    """
+
+    def __init__(self, address, config, training_set, authkey=None, chunk_size=None, cache=None, halving=None,
+                 task_timeout=600, move_selector=None, patches=False):
+        self.config = config
+        self.move_selector = move_selector
+        self.patches = patches
+        self.training_set = training_set
+        self.training_set_id = training_set.id
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.halving = halving
+        self.evaluation = 0
+        self.task_timeout = task_timeout
+        self.listener = Listener(address, authkey=authkey or get_authkey())
+        self.address = self.listener.address
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.next_task = 0
+        self.next_worker = 0
+        self.closed = False
+        threading.Thread(target=self.accept_workers, daemon=True).start()
+
+    @property
+    def num_workers(self):
+        return max(1, len(self.connections))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.listener.close()
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+
+    def accept_workers(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Raised for a closed listener and for peers that drop or fail authentication.
+                continue
+            threading.Thread(target=self.serve_worker, args=(conn,), daemon=True).start()
+
+    def serve_worker(self, conn):
+        with self.lock:
+            self.connections.add(conn)
+            worker = self.next_worker
+            self.next_worker += 1
+        try:
+            conn.send(('setup', worker, self.config, self.training_set, self.move_selector, self.patches))
+            while not self.closed:
+                try:
+                    task = self.tasks.get(timeout=1)
+                except queue.Empty:
+                    continue
+                try:
+                    conn.send(('play',) + task)
+                    if not conn.poll(self.task_timeout):
+                        raise TimeoutError
+                    result = conn.recv()
+                except (OSError, EOFError, TimeoutError):
+                    self.tasks.put(task)
+                    return
+                self.results.put(result)
+        except (OSError, EOFError):
+            pass
+        finally:
+            with self.lock:
+                self.connections.discard(conn)
+            conn.close()
+
+    def play_boards(self, genome_list, boards=None):
+        chunk_size = self.chunk_size or max(1, math.ceil(len(genome_list) / (self.num_workers * 4)))
+        pending = {}
+        for start in range(0, len(genome_list), chunk_size):
+            task_id = self.next_task
+            self.next_task += 1
+            pending[task_id] = start
+            self.tasks.put((task_id, self.training_set_id, genome_list[start:start + chunk_size], boards))
+
+        board_fitness = np.empty((len(genome_list), len(self.training_set) if boards is None else len(boards)))
+        while pending:
+            task_id, chunk_fitness, error = self.results.get()
+            # Results of chunks that were handed out twice only count once.
+            start = pending.pop(task_id, None)
+            if start is None:
+                continue
+            if error is not None:
+                # The rest of this generation's chunks are not needed any more.
+                while True:
+                    try:
+                        self.tasks.get_nowait()
+                    except queue.Empty:
+                        break
+                raise RuntimeError(f"A worker failed to play a chunk:\n{error}")
+            board_fitness[start:start + len(chunk_fitness)] = chunk_fitness
+        return board_fitness
+
+
+def run_worker(address, authkey=None, retry_interval=1):
+    """ Connects to a DistributedEvaluator, waiting for it to come up, and plays chunks until it closes. """
+    while True:
+        try:
+            conn = Client(address, authkey=authkey or get_authkey())
+            break
+        except ConnectionRefusedError:
+            time.sleep(retry_interval)
+
+    # Keyed by training set id, so a coordinator that switches sets only sends each one once.
+    training_sets = {}
+    config = move_selector = patches = None
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (OSError, EOFError):
+                return
+            if message[0] == 'setup':
+                worker, config, training_set, move_selector, patches = message[1:]
+                if move_selector is not None:
+                    # Each worker samples its own moves rather than replaying another worker's draws.
+                    move_selector = move_selector.spawn(worker)
+                training_sets[training_set.id] = training_set
+            else:
+                task_id, training_set_id, genome_list, boards = message[1:]
+                try:
+                    board_fitness = play_boards(genome_list, config, training_sets[training_set_id], boards=boards,
+                                                move_selector=move_selector, patches=patches)
+                except Exception:
+                    # Reported instead of raised, so one bad chunk does not take down every worker in turn.
+                    conn.send((task_id, None, traceback.format_exc()))
+                    continue
+                conn.send((task_id, board_fitness, None))
+
+
+def start_local_workers(num_workers, address, authkey=None):
+    """ Starts num_workers worker processes on this machine, e.g. to try the distributed mode locally. """
+    workers = [Process(target=run_worker, args=(address, authkey), daemon=True) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Runs evaluation workers for a DistributedEvaluator.")
+    parser.add_argument('address', help="coordinator HOST:PORT")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    host, port = args.address.rsplit(':', 1)
+    for process in start_local_workers(args.workers, (host, int(port))):
+        process.join()
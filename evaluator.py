@@ -0,0 +1,176 @@
+import math
+import os
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import profiling
+from compiled_net import CompiledNetwork
+from move_log import MoveLogWriter
+from patches import PatchNetwork
+
+worker_args = None
+
+
+def create_net(genome, config, training_set, patches=False):
+    """ Compiles genome to play training_set's boards, as a PatchNetwork if patches is set. """
+    if patches:
+        return PatchNetwork.create(genome, config, training_set.rows, training_set.columns)
+    return CompiledNetwork.create(genome, config)
+
+
+def play_genomes(genome_list, config, training_set, move_log=None, halving=None, move_selector=None, patches=False):
+    """ Plays every genome on every board of training_set and returns each genome's total fitness.
+
+    With a SuccessiveHalving, genomes that fall behind stop early and get an estimated total instead.
+    """
+    if halving is not None:
+        # Survivors play several rounds, so compile each genome only once.
+        nets = {id(genome): create_net(genome, config, training_set, patches) for genome in genome_list}
+        return halving.play(genome_list, training_set, lambda genomes, boards: play_boards(
+            genomes, config, training_set, move_log, boards, [nets[id(genome)] for genome in genomes], move_selector,
+            patches))
+    return reduce_fitness(play_boards(genome_list, config, training_set, move_log, move_selector=move_selector,
+                                      patches=patches))
+
+
+def reduce_fitness(board_fitness):
+    """ Sums a (genomes, boards) fitness array into per-genome totals.
+
+    Serial and parallel evaluation both reduce through here, once, so they agree bit for bit.
+    """
+    return board_fitness.sum(axis=1)
+
+
+def play_boards(genome_list, config, training_set, move_log=None, boards=None, nets=None, move_selector=None,
+                patches=False):
+    """ Plays every genome on every board of training_set and returns a (genomes, boards) fitness array.
+
+    boards optionally selects the training set boards to play, in order, and nets the genomes'
+    already compiled networks. With a MoveLogWriter, every move is also logged under the genome's
+    key and the board's index in training_set. move_selector picks the moves (argmax by default);
+    a sampling selector is not reproducible across different chunkings of the genomes. With patches,
+    the genomes are played as PatchNetworks, one score per tile.
+    """
+    if nets is None:
+        nets = [create_net(genome, config, training_set, patches) for genome in genome_list]
+    board_indices = np.arange(len(training_set)) if boards is None else np.asarray(boards)
+    training_size = len(board_indices)
+    num_outputs = training_set.rows * training_set.columns if patches else len(config.genome_config.output_keys)
+    games = training_set.create_games(len(genome_list), boards)
+
+    def get_outputs(boards, states):
+        # Live boards come back in order, so each genome's boards form one contiguous run.
+        output = np.empty((len(boards), num_outputs))
+        owners = boards // training_size
+        splits = np.flatnonzero(np.diff(owners)) + 1
+        for start, end in zip(np.r_[0, splits], np.r_[splits, len(boards)]):
+            output[start:end] = nets[owners[start]].activate_batch(states[start:end])
+        return output
+
+    on_moves = None
+    if move_log is not None:
+        genome_keys = np.array([genome.key for genome in genome_list])
+
+        def on_moves(boards, tiles, fitness):
+            move_log.write(genome_keys[boards // training_size], board_indices[boards % training_size], tiles,
+                           fitness)
+
+    while not games.game_over.all():
+        games.activate_net(get_outputs, stop_at_fixed_points=move_selector is None or move_selector.deterministic,
+                           on_moves=on_moves, select_moves=move_selector)
+
+    return games.fitness.reshape(len(genome_list), training_size)
+
+
+def init_worker(config, training_set, log_dir=None, profile=False, move_selector=None, patches=False):
+    global worker_args
+    if profile:
+        profiling.enable()
+    move_log = None
+    if log_dir is not None:
+        move_log = MoveLogWriter(os.path.join(log_dir, f"moves-{os.getpid()}.bin"))
+    if move_selector is not None:
+        # Every worker gets the same pickled selector; without its own stream each would sample the same moves.
+        move_selector = move_selector.spawn(os.getpid())
+    worker_args = (config, training_set, move_log, move_selector, patches)
+
+
+def play_chunk(chunk):
+    start, genome_list, boards, evaluation = chunk
+    config, training_set, move_log, move_selector, patches = worker_args
+    if move_log is not None:
+        move_log.evaluation = evaluation
+    board_fitness = play_boards(genome_list, config, training_set, move_log, boards, move_selector=move_selector,
+                                patches=patches)
+    if move_log is not None:
+        # Workers are not shut down cleanly, so nothing may be left in the buffer between chunks.
+        move_log.flush()
+    return start, board_fitness, profiling.drain()
+
+
+class ProcessEvaluator:
+    def __init__(self, num_workers, config, training_set, chunk_size=None, cache=None, log_dir=None, halving=None,
+                 move_selector=None, patches=False):
+        """
+        The config and training set are sent to each worker once (a saved training set is only sent
+        as its path and memory-mapped by the worker); evaluate() then only ships genomes, split into
+        chunks of chunk_size (by default about four chunks per worker). With a FitnessCache, genomes
+        whose phenotype was already played on this training set are not sent at all. With a log_dir,
+        each worker streams the moves it plays to its own log file in a new directory (log_dir) made
+        for this run inside it, each move tagged with the evaluation it was played in. If profiling
+        is enabled when the evaluator is created, workers profile too and send their timings back.
+        With a SuccessiveHalving, each round's surviving genomes are spread over the workers again.
+        move_selector is sent to the workers to pick moves with, and with patches they play the genomes as
+        PatchNetworks.
+        """
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.training_set_id = training_set.id
+        self.training_set = training_set
+        self.cache = cache
+        self.halving = halving
+        self.evaluation = 0
+        if log_dir is not None:
+            os.makedirs(log_dir, exist_ok=True)
+            log_dir = tempfile.mkdtemp(prefix=time.strftime('%Y%m%d-%H%M%S-'), dir=log_dir)
+        self.log_dir = log_dir
+        self.pool = Pool(num_workers, initializer=init_worker,
+                         initargs=(config, training_set, log_dir, profiling.is_enabled(), move_selector, patches))
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def play(self, genome_list):
+        self.evaluation += 1
+        if self.halving is not None:
+            return self.halving.play(genome_list, self.training_set, self.play_boards)
+        return reduce_fitness(self.play_boards(genome_list))
+
+    def play_boards(self, genome_list, boards=None):
+        chunk_size = self.chunk_size or max(1, math.ceil(len(genome_list) / (self.num_workers * 4)))
+        chunks = [(i, genome_list[i:i + chunk_size], boards, self.evaluation)
+                  for i in range(0, len(genome_list), chunk_size)]
+        # Each chunk owns its own rows, so results can be stored as they arrive in any order.
+        board_fitness = np.empty((len(genome_list), len(self.training_set) if boards is None else len(boards)))
+        for start, chunk_fitness, timings in self.pool.imap_unordered(play_chunk, chunks):
+            board_fitness[start:start + len(chunk_fitness)] = chunk_fitness
+            profiling.merge(timings)
+        return board_fitness
+
+    def evaluate(self, genomes, config):
+        genome_list = [genome for genome_id, genome in genomes]
+        if self.cache is not None:
+            self.cache.evaluate(genome_list, config, self.training_set_id, self.play, self.halving)
+            return
+
+        for genome, fitness in zip(genome_list, self.play(genome_list)):
+            genome.fitness = fitness
@@ -0,0 +1,75 @@
+import hashlib
+from collections import OrderedDict
+
+from compiled_net import get_layers
+
+
+def genome_key(genome, config, training_set_id):
+    """ Returns a stable hash of everything that affects a genome's play on training_set_id.
+
+    Only the nodes and enabled connections FeedForwardNetwork would actually evaluate are included,
+    so genomes that differ only in disabled or unused genes share a key.
+    """
+    genome_config = config.genome_config
+    connections = sorted(cg.key for cg in genome.connections.values() if cg.enabled)
+    layers = get_layers(genome_config.input_keys, genome_config.output_keys, connections)
+    used = set().union(*layers)
+
+    parts = [training_set_id]
+    for node in sorted(used):
+        ng = genome.nodes[node]
+        parts.append(f"n{node}:{ng.bias!r}:{ng.response!r}:{ng.activation}:{ng.aggregation}")
+    for inode, onode in connections:
+        if onode in used:
+            parts.append(f"c{inode},{onode}:{genome.connections[inode, onode].weight!r}")
+    return hashlib.sha1(";".join(parts).encode()).hexdigest()
+
+
+class FitnessCache:
+    """ LRU map from genome_key to fitness, so unchanged elites and identical phenotypes skip simulation. """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        fitness = self.entries.get(key)
+        if fitness is not None:
+            self.entries.move_to_end(key)
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def evaluate(self, genome_list, config, training_set_id, play, halving=None):
+        """ Sets every genome's fitness, calling play(genomes) -> fitnesses only for unseen phenotypes.
+
+        If play races genomes with halving, only the genomes it played to the end are cached.
+        """
+        keys = [genome_key(genome, config, training_set_id) for genome in genome_list]
+        fitnesses = {}
+        missing = {}
+        for genome, key in zip(genome_list, keys):
+            if key not in fitnesses and key not in missing:
+                fitness = self.get(key)
+                if fitness is None:
+                    missing[key] = genome
+                else:
+                    fitnesses[key] = fitness
+        self.hits += len(genome_list) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            played = play(list(missing.values()))
+            exact = [True] * len(missing) if halving is None else halving.exact
+            for key, fitness, cache in zip(missing, played, exact):
+                fitnesses[key] = fitness
+                if cache:
+                    self.put(key, fitness)
+        for genome, key in zip(genome_list, keys):
+            genome.fitness = fitnesses[key]
@@ -1,8 +1,14 @@
-from itertools import chain
+from functools import cached_property
 from typing import Callable
 
 import random
 
+import numpy as np
+
+from board import Board
+from move_selection import argmax_selector
+from neighbors import get_flat_neighbor_lists
+
 LIGHT_GRAY = (225, 225, 225)
 BLACK = (0, 0, 0)
 GRAY = (150, 150, 150)
@@ -27,7 +33,8 @@ already_revealed_penalty = -2
 
 
 class Game:
-    def __init__(self, rows, columns, index, net, size, bomb_list, on_game_over: Callable[[int, int], None]):
+    def __init__(self, rows, columns, index, net, size, bomb_list, on_game_over: Callable[[int, int], None],
+                 move_selector=None):
         self.columns = columns
         self.tile_size = size / self.columns
         self.rows = rows
@@ -38,117 +45,131 @@ class Game:
         self.fitness = 0
         self.index = index
         self.net = net
-        self.tiles = []
+        self.move_selector = move_selector or argmax_selector
+        self.board = None
+        self.neighbors = get_flat_neighbor_lists(rows, columns)
         self.mouse_x = 0
         self.mouse_y = 0
         self.moves = 0
+        self.revealed_safe = 0
+        self.safe_tiles = rows * columns - len(bomb_list)
 
         self.create_grid()
         self.add_bombs()
         self.click_random()
         self.game_started = True
 
+    @cached_property
+    def tiles(self):
+        """ Tile views of the board indexed [x][y], made on first use for code that works tile by tile. """
+        return [[Tile(self, x * self.columns + y) for y in range(self.columns)] for x in range(self.rows)]
+
     def click_random(self):
-        for x, rows in enumerate(self.tiles):
-            for y, tile in enumerate(rows):
-                if tile.touching == 0:
-                    self.reveal_from(x, y)
-                    return
+        for i, touching in enumerate(self.board.touching):
+            if touching == 0:
+                self.reveal_from(*divmod(i, self.columns))
+                return
 
     def get_net_output(self):
-        tiles_flat = list(chain.from_iterable(self.tiles))
-        representations = list(map(lambda t: t.get_visible_representation(), tiles_flat))
-        output = self.net.activate(representations)
+        output = self.net.activate(self.board.get_visible_state())
         return output
 
     def activate_net(self):
+        # A finished game has already reported its fitness; playing on would report it again.
+        if self.game_over:
+            return
         self.moves += 1
         self.fitness += move_penalty
         if self.moves > move_limit:
             self.game_over = True
             self.on_game_over(self.fitness, self.index)
         if self.game_started:
-            output = self.get_net_output()
-            reshaped_output = [output[i:i+self.columns] for i in range(0, len(output), self.columns)]
-            max_output = reshaped_output[0][0]
-            max_x = 0
-            max_y = 0
-            for x, rows in enumerate(reshaped_output):
-                for y, out in enumerate(rows):
-                    if out > max_output:
-                        max_output = out
-                        max_x = x
-                        max_y = y
-
-            tile = self.tiles[max_x][max_y]
-            self.handle_tile_click(tile, max_x, max_y)
+            output = np.asarray(self.get_net_output())[np.newaxis]
+            revealed = np.frombuffer(self.board.revealed, dtype=bool)[np.newaxis]
+            flagged = np.frombuffer(self.board.flagged, dtype=bool)[np.newaxis]
+            self.click_tile(int(self.move_selector(output, revealed, flagged)[0]))
 
     def create_grid(self):
-        for rows in range(self.rows):
-            row = []
-            for col in range(self.columns):
-                row.append(Tile())
-            self.tiles.append(row)
+        self.board = Board(self.rows, self.columns)
 
     def add_bombs(self):
-        for b in self.bomb_list:
-            self.tiles[b[0]][b[1]].set_bomb()
-        self.update_touching()
-
-    def update_touching(self):
-        for x, rows in enumerate(self.tiles):
-            for y, tile in enumerate(rows):
-                tile.update_touching(x, y, self.tiles, self.rows, self.columns)
+        self.board.set_bombs(self.bomb_list, self.neighbors)
 
     def reveal_all(self):
-        for x, rows in enumerate(self.tiles):
-            for y, tile in enumerate(rows):
-                tile.reveal()
+        self.board.revealed[:] = b'\x01' * len(self.board.revealed)
+        self.revealed_safe = self.safe_tiles
         self.game_over = True
         self.on_game_over(self.fitness, self.index)
 
     def handle_tile_click(self, tile, x, y):
-        if tile.touching == 0:
-            self.reveal_from(x, y)
+        self.click_tile(x * self.columns + y)
+
+    def click_tile(self, i):
+        if self.board.touching[i] == 0:
+            self.reveal_from(*divmod(i, self.columns))
         if not self.game_over:
-            fitness_change = tile.click(self.reveal_all)
+            fitness_change = self.click(i)
             self.fitness += fitness_change
-
             self.check_game_win()
 
+    def click(self, i):
+        """ Reveals tile i like a click on it and returns the fitness change, ending the game on a bomb. """
+        board = self.board
+        if board.revealed[i]:
+            return already_revealed_penalty
+        if board.flagged[i]:
+            return 0
+        board.revealed[i] = 1
+        if board.bombs[i]:
+            self.reveal_all()
+            return bomb_penalty
+        self.revealed_safe += 1
+        return correct_tile_fitness
+
+    def reveal(self, i):
+        """ Reveals tile i without scoring it or ending the game. """
+        if not self.board.revealed[i]:
+            self.board.revealed[i] = 1
+            if not self.board.bombs[i]:
+                self.revealed_safe += 1
+
+    def flag(self, i):
+        if not self.board.revealed[i]:
+            self.board.flagged[i] ^= 1
+
     def reveal_from(self, x, y):
-        for temp_x in range(-1, 2):
-            for temp_y in range(-1, 2):
-                final_x = x + temp_x
-                final_y = y + temp_y
-                if final_x < 0 or final_x >= self.rows:
-                    continue
-                if final_y < 0 or final_y >= self.columns:
-                    continue
-                if final_y == y and final_x == x:
-                    continue
-                tile_to_reveal = self.tiles[final_x][final_y]
-                if not tile_to_reveal.is_revealed:
-                    fitness_change = tile_to_reveal.click(lambda *args: None)
+        # Iterative flood fill: every tile pushed was just revealed, so each one is expanded at most once.
+        # Flagged zero tiles stay hidden and are not expanded. Flooding only leaves zero tiles, so it never
+        # reaches a bomb.
+        board = self.board
+        stack = [x * self.columns + y]
+        while stack:
+            for i in self.neighbors[stack.pop()]:
+                if not board.revealed[i] and not board.flagged[i]:
+                    board.revealed[i] = 1
+                    self.revealed_safe += 1
                     if self.game_started:
-                        self.fitness += fitness_change
-                    if tile_to_reveal.touching == 0:
-                        self.reveal_from(final_x, final_y)
+                        self.fitness += correct_tile_fitness
+                    if board.touching[i] == 0:
+                        stack.append(i)
 
     def check_game_win(self):
         if self.game_over:
             return
-        count = 0
-        for x, rows in enumerate(self.tiles):
-            for y, tile in enumerate(rows):
-                if tile.is_revealed and not tile.is_bomb:
-                    count += 1
 
-        if count == self.columns * self.rows - len(self.bomb_list):
+        if self.revealed_safe == self.safe_tiles:
             self.game_over = True
             self.fitness += win_bonus
             self.on_game_over(self.fitness, self.index)
 
+    def snapshot(self):
+        """ Returns everything that changes during play, for restore() to rewind to. """
+        return self.board.snapshot(), self.fitness, self.moves, self.revealed_safe, self.game_over
+
+    def restore(self, snapshot):
+        board, self.fitness, self.moves, self.revealed_safe, self.game_over = snapshot
+        self.board.restore(board)
+
     def get_tile(self, x, y):
         tile_x = int(x / self.tile_size)
         tile_y = int(y / self.tile_size)
@@ -162,36 +183,42 @@ class Game:
 
     @staticmethod
     def get_random_bomb_list(rows, columns, num_bombs):
-        bombs_list = []
-        for _ in range(num_bombs):
-            x = random.randint(0, rows - 1)
-            y = random.randint(0, columns - 1)
-            while Game.check_bombs([x, y], bombs_list):
-                x = random.randint(0, rows - 1)
-                y = random.randint(0, columns - 1)
-            bombs_list.append([x, y])
-        return bombs_list
+        tiles = random.sample(range(rows * columns), num_bombs)
+        return [[tile // columns, tile % columns] for tile in tiles]
 
 
 class Tile:
-    def __init__(self):
-        self.is_bomb = False
-        self.touching = 0
-        self.is_revealed = False
-        self.is_flagged = False
-
-    def click(self, reveal_all):
-        if not self.is_revealed:
-            if self.is_flagged:
-                return 0
-            self.is_revealed = True
-            if self.is_bomb:
-                reveal_all()
-                return bomb_penalty
-            else:
-                return correct_tile_fitness
-        else:
-            return already_revealed_penalty
+    """ A view of one tile of a Game's Board, with the attributes and methods of the old per-tile objects.
+
+    The methods that change the tile go through the Game, so its revealed_safe count stays right.
+    """
+
+    __slots__ = ('game', 'board', 'index')
+
+    def __init__(self, game, index):
+        self.game = game
+        self.board = game.board
+        self.index = index
+
+    @property
+    def is_bomb(self):
+        return bool(self.board.bombs[self.index])
+
+    @property
+    def touching(self):
+        return self.board.touching[self.index]
+
+    @property
+    def is_revealed(self):
+        return bool(self.board.revealed[self.index])
+
+    @property
+    def is_flagged(self):
+        return bool(self.board.flagged[self.index])
+
+    def click(self, reveal_all=None):
+        """ Game.click on this tile; a bomb ends the game through Game.reveal_all, so reveal_all is unused. """
+        return self.game.click(self.index)
 
     def get_visible_representation(self):
         if self.is_revealed:
@@ -200,30 +227,7 @@ class Tile:
             return -1
 
     def flag(self):
-        if not self.is_revealed:
-            self.is_flagged = not self.is_flagged
+        self.game.flag(self.index)
 
     def reveal(self):
-        self.is_revealed = True
-
-    def set_bomb(self):
-        self.is_bomb = True
-
-    def update_touching(self, x, y, tiles, rows, columns):
-        if not self.is_bomb:
-            count = 0
-            for temp_x in range(-1, 2):
-                for temp_y in range(-1, 2):
-                    final_x = x + temp_x
-                    final_y = y + temp_y
-                    if final_x < 0 or final_x >= rows:
-                        continue
-                    if final_y < 0 or final_y >= columns:
-                        continue
-                    if final_y == y and final_x == x:
-                        continue
-                    if tiles[final_x][final_y].is_bomb:
-                        count += 1
-            self.touching = count
-        else:
-            self.touching = -1
+        self.game.reveal(self.index)
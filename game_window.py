@@ -1,3 +1,4 @@
+import math
 from itertools import chain
 from typing import Callable
 
@@ -6,6 +7,9 @@ import pyglet
 import random
 import imageio.v2 as iio
 
+from move_selection import argmax_selector
+from neighbors import get_neighbor_lists
+
 LIGHT_GRAY = (225, 225, 225)
 BLACK = (0, 0, 0)
 GRAY = (150, 150, 150)
@@ -34,7 +38,8 @@ already_revealed_penalty = -2
 
 
 class GameWindow(pyglet.window.Window):
-    def __init__(self, rows, columns, index, net, size, bomb_list, on_game_over: Callable[[int, int], None]):
+    def __init__(self, rows, columns, index, net, size, bomb_list, on_game_over: Callable[[int, int], None],
+                 move_selector=None):
         super().__init__(width=size, height=size, caption=f"{index}")
         self.columns = columns
         self.tile_size = self.width / self.columns
@@ -46,7 +51,9 @@ class GameWindow(pyglet.window.Window):
         self.fitness = 0
         self.index = index
         self.net = net
+        self.move_selector = move_selector or argmax_selector
         self.tiles = []
+        self.neighbors = get_neighbor_lists(rows, columns)
         self.mouse_x = 0
         self.mouse_y = 0
         self.batch = pyglet.graphics.Batch()
@@ -57,6 +64,7 @@ class GameWindow(pyglet.window.Window):
         self.add_bombs()
         self.click_random()
         self.game_started = True
+        self.view = BoardView(self.tiles, self.batch, 0, 0, self.tile_size)
 
         pyglet.clock.schedule_interval(self.activate_net, move_interval)
 
@@ -74,6 +82,10 @@ class GameWindow(pyglet.window.Window):
         return output
 
     def activate_net(self, _):
+        # A finished game has already reported its fitness; playing on would report it again.
+        if self.game_over:
+            pyglet.clock.unschedule(self.activate_net)
+            return
         self.moves += 1
         self.fitness += move_penalty
         if self.moves > move_limit:
@@ -81,20 +93,12 @@ class GameWindow(pyglet.window.Window):
             self.on_game_over(self.fitness, self.index)
             # self.close()
         if self.game_started:
-            output = self.get_net_output()
-            reshaped_output = [output[i:i+self.columns] for i in range(0, len(output), self.columns)]
-            max_output = reshaped_output[0][0]
-            max_x = 0
-            max_y = 0
-            for x, rows in enumerate(reshaped_output):
-                for y, out in enumerate(rows):
-                    if out > max_output:
-                        max_output = out
-                        max_x = x
-                        max_y = y
-
-            tile = self.tiles[max_x][max_y]
-            self.handle_tile_click(tile, max_x, max_y)
+            output = np.asarray(self.get_net_output())[np.newaxis]
+            tiles_flat = list(chain.from_iterable(self.tiles))
+            revealed = np.array([[tile.is_revealed for tile in tiles_flat]])
+            flagged = np.array([[tile.is_flagged for tile in tiles_flat]])
+            x, y = divmod(int(self.move_selector(output, revealed, flagged)[0]), self.columns)
+            self.handle_tile_click(self.tiles[x][y], x, y)
 
     def create_grid(self):
         for rows in range(self.rows):
@@ -111,14 +115,10 @@ class GameWindow(pyglet.window.Window):
     def update_touching(self):
         for x, rows in enumerate(self.tiles):
             for y, tile in enumerate(rows):
-                tile.update_touching(x, y, self.tiles, self.rows, self.columns)
+                tile.update_touching(self.neighbors[x][y], self.tiles)
 
     def draw_grid(self):
-        rects = []
-        for x, rows in enumerate(self.tiles):
-            for y, tile in enumerate(rows):
-                rects.append(tile.draw_tile(self.batch, x, y, self.width / self.columns, 4))
-
+        self.view.update()
         self.batch.draw()
 
     def on_draw(self):
@@ -174,23 +174,17 @@ class GameWindow(pyglet.window.Window):
             self.activate_net(None)
 
     def reveal_from(self, x, y):
-        for temp_x in range(-1, 2):
-            for temp_y in range(-1, 2):
-                final_x = x + temp_x
-                final_y = y + temp_y
-                if final_x < 0 or final_x >= self.rows:
-                    continue
-                if final_y < 0 or final_y >= self.columns:
-                    continue
-                if final_y == y and final_x == x:
-                    continue
+        stack = [(x, y)]
+        while stack:
+            x, y = stack.pop()
+            for final_x, final_y in self.neighbors[x][y]:
                 tile_to_reveal = self.tiles[final_x][final_y]
                 if not tile_to_reveal.is_revealed:
                     fitness_change = tile_to_reveal.click(lambda *args: None)
                     if self.game_started:
                         self.fitness += fitness_change
-                    if tile_to_reveal.touching == 0:
-                        self.reveal_from(final_x, final_y)
+                    if tile_to_reveal.is_revealed and tile_to_reveal.touching == 0:
+                        stack.append((final_x, final_y))
 
     def check_game_win(self):
         if self.game_over:
@@ -221,15 +215,8 @@ class GameWindow(pyglet.window.Window):
 
     @staticmethod
     def get_random_bomb_list(rows, columns, num_bombs):
-        bombs_list = []
-        for _ in range(num_bombs):
-            x = random.randint(0, rows - 1)
-            y = random.randint(0, columns - 1)
-            while GameWindow.check_bombs([x, y], bombs_list):
-                x = random.randint(0, rows - 1)
-                y = random.randint(0, columns - 1)
-            bombs_list.append([x, y])
-        return bombs_list
+        tiles = random.sample(range(rows * columns), num_bombs)
+        return [[tile // columns, tile % columns] for tile in tiles]
 
 
 class Tile:
@@ -268,53 +255,123 @@ class Tile:
     def set_bomb(self):
         self.is_bomb = True
 
-    def update_touching(self, x, y, tiles, rows, columns):
+    def update_touching(self, neighbors, tiles):
         if not self.is_bomb:
             count = 0
-            for temp_x in range(-1, 2):
-                for temp_y in range(-1, 2):
-                    final_x = x + temp_x
-                    final_y = y + temp_y
-                    if final_x < 0 or final_x >= rows:
-                        continue
-                    if final_y < 0 or final_y >= columns:
-                        continue
-                    if final_y == y and final_x == x:
-                        continue
-                    if tiles[final_x][final_y].is_bomb:
-                        count += 1
+            for x, y in neighbors:
+                if tiles[x][y].is_bomb:
+                    count += 1
             self.touching = count
         else:
             self.touching = -1
 
-    def draw_tile(self, batch, x, y, size, offset):
-        objects = []
-        translated_x = x * size + offset
-        translated_y = y * size + offset
-        translated_size = size - offset * 2
+
+class BoardView:
+    """ Retained pyglet shapes for one board, drawn at (x, y) in the batch.
+
+    The shapes for each tile are created once; update() only touches tiles whose revealed or flagged
+    state changed since the last call, so the batch and the frame time stay the same size however
+    long the window runs. tiles can be the grid of a GameWindow or of a headless Game.
+    """
+
+    def __init__(self, tiles, batch, x, y, tile_size, offset=4):
+        self.tiles = tiles
+        self.batch = batch
+        self.x = x
+        self.y = y
+        self.tile_size = tile_size
+        self.offset = offset
+        self.rects = []
+        self.labels = {}
+        self.sprites = {}
+        self.states = []
+        for tile_x, rows in enumerate(tiles):
+            rects = []
+            for tile_y, tile in enumerate(rows):
+                left, bottom, size = self.get_bounds(tile_x, tile_y)
+                rects.append(pyglet.shapes.Rectangle(left, bottom, size, size, color=GRAY, batch=batch,
+                                                     group=background))
+            self.rects.append(rects)
+            self.states.append([(False, False)] * len(rows))
+        self.update()
+
+    def get_bounds(self, tile_x, tile_y):
+        return (self.x + tile_x * self.tile_size + self.offset, self.y + tile_y * self.tile_size + self.offset,
+                self.tile_size - self.offset * 2)
+
+    def update(self):
+        for tile_x, rows in enumerate(self.tiles):
+            for tile_y, tile in enumerate(rows):
+                state = (tile.is_revealed, tile.is_flagged)
+                if state != self.states[tile_x][tile_y]:
+                    self.states[tile_x][tile_y] = state
+                    self.update_tile(tile_x, tile_y, tile)
+
+    def update_tile(self, tile_x, tile_y, tile):
         color = GRAY
-        if self.is_flagged:
-            sprite = pyglet.sprite.Sprite(flag, translated_x, translated_y, batch=batch, group=foreground)
-            sprite.width = translated_size
-            sprite.height = translated_size
-            objects.append(sprite)
-        elif self.is_revealed and self.is_bomb:
-            sprite = pyglet.sprite.Sprite(bomb, translated_x, translated_y, batch=batch, group=foreground)
-            sprite.width = translated_size
-            sprite.height = translated_size
+        image = None
+        if tile.is_flagged:
+            image = flag
+        elif tile.is_revealed and tile.is_bomb:
+            image = bomb
             color = RED
-            objects.append(sprite)
-        elif self.is_revealed and self.touching != 0:
-            label = pyglet.text.Label(f"{self.touching}", translated_x, translated_y, translated_size, translated_size,
-                                      align='center', font_size=translated_size / 2, batch=batch, group=foreground,
-                                      color=TOUCHING_COLORS[self.touching])
-            color = LIGHT_GRAY
-            objects.append(label)
-        elif self.is_revealed:
+        elif tile.is_revealed:
             color = LIGHT_GRAY
+        self.rects[tile_x][tile_y].color = color
+
+        # Sprites and labels are made the first time a tile needs them and only hidden afterwards.
+        sprite = self.sprites.get((tile_x, tile_y))
+        if image is not None:
+            if sprite is None or sprite.image is not image:
+                if sprite is not None:
+                    sprite.delete()
+                left, bottom, size = self.get_bounds(tile_x, tile_y)
+                sprite = pyglet.sprite.Sprite(image, left, bottom, batch=self.batch, group=foreground)
+                sprite.width = size
+                sprite.height = size
+                self.sprites[tile_x, tile_y] = sprite
+            sprite.visible = True
+        elif sprite is not None:
+            sprite.visible = False
+
+        show_label = image is None and tile.is_revealed and tile.touching != 0
+        label = self.labels.get((tile_x, tile_y))
+        if show_label and label is None:
+            left, bottom, size = self.get_bounds(tile_x, tile_y)
+            label = pyglet.text.Label(f"{tile.touching}", left, bottom, width=size, height=size, align='center',
+                                      font_size=size / 2, batch=self.batch, group=foreground,
+                                      color=TOUCHING_COLORS[tile.touching])
+            self.labels[tile_x, tile_y] = label
+        if label is not None:
+            label.visible = show_label
+
+
+class GameGridWindow(pyglet.window.Window):
+    """ Plays many headless Games side by side in one window, one BoardView per game in a shared batch. """
+
+    def __init__(self, games, size, interval=move_interval):
+        self.games = games
+        self.grid_columns = math.ceil(math.sqrt(len(games)))
+        grid_rows = math.ceil(len(games) / self.grid_columns)
+        board_size = size / self.grid_columns
+        super().__init__(width=size, height=round(board_size * grid_rows), caption=f"{len(games)} games")
+        self.batch = pyglet.graphics.Batch()
+        self.views = []
+        for i, game in enumerate(games):
+            # Fill the grid from the top left, like reading order.
+            x = i % self.grid_columns * board_size
+            y = (grid_rows - 1 - i // self.grid_columns) * board_size
+            self.views.append(BoardView(game.tiles, self.batch, x, y, board_size / max(game.rows, game.columns)))
+
+        pyglet.clock.schedule_interval(self.activate_nets, interval)
 
-        objects.append(
-            pyglet.shapes.Rectangle(translated_x, translated_y, translated_size, translated_size,
-                                    color=color, batch=batch, group=background))
+    def activate_nets(self, _):
+        for game in self.games:
+            if not game.game_over:
+                game.activate_net()
 
-        return objects
+    def on_draw(self):
+        self.clear()
+        for view in self.views:
+            view.update()
+        self.batch.draw()
@@ -0,0 +1,87 @@
+import math
+
+import numpy as np
+
+from evaluator import reduce_fitness
+from game import correct_tile_fitness, win_bonus, move_penalty, move_limit, already_revealed_penalty
+
+
+def get_fitness_bounds(training_set):
+    """ Returns the lowest and highest fitness any genome can score on each board of training_set.
+
+    A move can at best reveal every hidden safe tile and win, and at worst click a revealed tile,
+    which holds for all move_limit moves.
+    """
+    hidden_safe = (~np.asarray(training_set.bombs) & ~np.asarray(training_set.revealed)).sum(axis=1)
+    high = (max(correct_tile_fitness, 0) * hidden_safe + max(win_bonus, 0)
+            + (move_limit + 1) * max(move_penalty, 0))
+    low = np.full(len(training_set), (move_limit + 1) * min(move_penalty, 0)
+                  + move_limit * min(already_revealed_penalty, 0))
+    return low, high
+
+
+class SuccessiveHalving:
+    """ Races genomes over growing prefixes of the training set instead of playing every board.
+
+    All genomes play the first min_boards boards. Each species then races on its own: genomes whose
+    best possible total is below the worst possible total of another genome of their species are
+    dropped, then only the best 1/eta of the species (by total so far, at least its best genome) go
+    on to a prefix eta times longer, until the survivors have played the whole set. Survivors get
+    their exact total; dropped genomes get their mean per board scaled to the full set, capped so
+    they never rank above a genome of their species that outlasted them. Set species_set to the
+    population's species (pop.species), which neat re-speciates in place before every evaluation;
+    without it, or for genomes it does not know, the genomes race as one species. After play, exact
+    tells which totals are exact: an estimate depends on the rest of the species, so it must not be
+    cached.
+    """
+
+    def __init__(self, min_boards=10, eta=2, species_set=None):
+        self.min_boards = min_boards
+        self.eta = eta
+        self.species_set = species_set
+        self.exact = None
+
+    def get_species(self, genome_list):
+        """ Returns the species key of every genome, or -1 where species_set has none. """
+        if self.species_set is None:
+            return np.full(len(genome_list), -1)
+        genome_to_species = self.species_set.genome_to_species
+        return np.array([genome_to_species.get(genome.key, -1) for genome in genome_list], dtype=np.int64)
+
+    def play(self, genome_list, training_set, play_boards):
+        """ Returns each genome's total fitness, using play_boards(genomes, boards) -> (genomes, boards) fitness. """
+        training_size = len(training_set)
+        low, high = get_fitness_bounds(training_set)
+        species = self.get_species(genome_list)
+        board_fitness = np.zeros((len(genome_list), training_size))
+        played = np.zeros(len(genome_list), dtype=np.int64)
+        alive = np.arange(len(genome_list))
+        start, end = 0, min(self.min_boards, training_size)
+        while len(alive):
+            boards = np.arange(start, end)
+            board_fitness[alive, start:end] = play_boards([genome_list[i] for i in alive], boards)
+            played[alive] = end
+            if end == training_size:
+                break
+
+            survivors = []
+            for key in np.unique(species[alive]):
+                members = alive[species[alive] == key]
+                totals = board_fitness[members, :end].sum(axis=1)
+                contenders = totals + high[end:].sum() >= (totals + low[end:].sum()).max()
+                members, totals = members[contenders], totals[contenders]
+                # A stable sort keeps the earlier genome on ties, so the same population always races the same way.
+                best = np.argsort(-totals, kind='stable')[:max(1, math.ceil(len(members) / self.eta))]
+                survivors.append(members[best])
+            alive = np.sort(np.concatenate(survivors))
+            start, end = end, min(training_size, end * self.eta)
+
+        totals = reduce_fitness(board_fitness)
+        self.exact = played == training_size
+        for key in np.unique(species):
+            members = species == key
+            for boards_played in np.unique(played[members & ~self.exact])[::-1]:
+                dropped = members & (played == boards_played)
+                estimates = board_fitness[dropped].sum(axis=1) / boards_played * training_size
+                totals[dropped] = np.minimum(estimates, totals[members & (played > boards_played)].min())
+        return totals
@@ -0,0 +1,34 @@
+import numpy as np
+
+from neighbors import get_neighbor_table
+
+
+def generate_layouts(rows, columns, num_bombs, count, seed=None, opening=None):
+    """ Draws count bomb layouts as a (count, rows * columns) bool mask, flat row-major like BatchGame.
+
+    Each layout is an independent sample of num_bombs tiles without replacement from a NumPy
+    generator seeded with seed. If opening is an (x, y) tile, that tile and its neighbors are kept
+    free of bombs so every layout has a zero tile there for the opening move to flood from.
+    """
+    num_tiles = rows * columns
+    rng = np.random.default_rng(seed)
+    keys = rng.random((count, num_tiles), dtype=np.float32)
+    if opening is not None:
+        x, y = opening
+        excluded = get_neighbor_table(rows, columns)[x * columns + y]
+        excluded = np.append(excluded[excluded < num_tiles], x * columns + y)
+        if num_bombs > num_tiles - len(excluded):
+            raise ValueError(f"{num_bombs} bombs do not fit on a {rows}x{columns} board with an opening at {opening}")
+        keys[:, excluded] = np.inf
+
+    mask = np.zeros((count, num_tiles), dtype=bool)
+    if num_bombs > 0:
+        # The num_bombs smallest keys of each row are a uniform sample without replacement.
+        bombs = np.argpartition(keys, num_bombs - 1, axis=1)[:, :num_bombs]
+        np.put_along_axis(mask, bombs, True, axis=1)
+    return mask
+
+
+def get_bomb_lists(mask, columns):
+    """ Converts a layout mask back into the [x, y] bomb lists Game and GameWindow take. """
+    return [[[int(i) // columns, int(i) % columns] for i in np.flatnonzero(layout)] for layout in mask]
@@ -1,73 +1,80 @@
-import concurrent.futures
 import os.path
 
-import pyglet
 import neat
 
 import visualize
-from game import Game
-from game_window import GameWindow
+from checkpoints import ColumnarCheckpointer
+from curriculum import Curriculum, Stage
+from distributed import DistributedEvaluator, start_local_workers
+from evaluator import ProcessEvaluator, create_net, play_genomes
+from fitness_cache import FitnessCache
+from halving import SuccessiveHalving
+from layouts import get_bomb_lists
+from move_selection import MoveSelector
+from profiling import ProfilingReporter
+from renderer import BoardRenderer, record_games, save_video
+from solver import DeductionReporter, Oracle
+from stats_log import StatsReporter
+from training_set import TrainingSet
 
 size = 512
 rows = 5
 columns = 5
 bombs = 5
-bomb_lists = []
 training_size = 100
-num_threads = 16
-for i in range(training_size):
-    bomb_list = Game.get_random_bomb_list(rows, columns, bombs)
-    bomb_lists.append(bomb_list)
-
-def run_sims(ge):
-    while len(ge) > 0:
-        for g in ge:
-            if len(g) > 0:
-                for game in g:
-                    if game.game_over:
-                        g.remove(game)
-                    else:
-                        game.activate_net()
-            else:
-                ge.remove(g)
+num_workers = os.cpu_count()
+seed = 0
+# Record the winner's games to video files instead of opening a window, e.g. on a server without a display.
+headless = False
+num_recordings = 4
+recording_fps = 2
+# Directory to stream every evaluated move to (see move_log.py), or None. Each run writes to a new subdirectory.
+move_log_dir = None
+# File to write per-generation phase timings to (.csv or .json), or None to leave profiling off.
+profile_path = None
+# File the per-generation fitness and species statistics are streamed to; plot it during a run with
+# `python stats_log.py neat-stats.jsonl --follow 60`.
+stats_path = 'neat-stats.jsonl'
+# Race genomes over growing subsets of the training set, e.g. SuccessiveHalving(min_boards=10), or None.
+halving = None
+# How moves are picked from the net's outputs, e.g. MoveSelector(mask_illegal=True) to skip revealed tiles.
+move_selector = MoveSelector()
+# Address to evaluate on remote workers at, e.g. ('0.0.0.0', 6000), or None to use a local process pool.
+# Workers join with `python distributed.py HOST:PORT`; local_workers more are started on this machine. Both
+# sides need the same secret in MINESWEEPER_AUTHKEY.
+distributed_address = None
+local_workers = 0
+# Train on growing boards instead of the fixed training set below, e.g.
+# [Stage(5, 5, 3), Stage(8, 8, 10, promote_at=0.4), Stage(16, 16, 40)], or None. Uses config-patch.txt.
+curriculum_stages = None
+# Score each tile with one small net that sees the 5x5 patch around it instead of the whole board, so
+# the genome's size does not depend on the board's (see patches.py). Uses config-patch.txt; curricula always do.
+patches = curriculum_stages is not None
+# Train only on the boards that can be won from the opening without guessing (see solver.py).
+solvable_only = False
+# Print which fraction of the moves with a provably safe tile each generation's best genome got right.
+report_deductions = True
+training_set_path = os.path.join(os.path.dirname(__file__), 'training-sets',
+                                 f'{rows}x{columns}-{bombs}-{training_size}-{seed}')
+training_set = TrainingSet.load_or_create(training_set_path, rows, columns, bombs, training_size, seed)
+if solvable_only:
+    solvable_path = training_set_path + '-solvable'
+    if not os.path.exists(os.path.join(solvable_path, 'meta.json')):
+        training_set.select(Oracle().get_solvable(training_set)).save(solvable_path)
+    training_set = TrainingSet.load(solvable_path)
+
+# A sampling move selector makes fitness a random draw, which the cache would freeze once per phenotype.
+fitness_cache = FitnessCache() if move_selector.deterministic else None
 
 def eval_genomes(genomes, config):
-    ge = []
-    genome_list = []
-    for i, [genome_id, genome] in enumerate(genomes):
-        genome_list.append(genome)
-        genome.fitness = 0
-
-        def on_game_over(fit: int, index: int):
-            genome_list[index].fitness += fit
-
-        net = neat.nn.FeedForwardNetwork.create(genome, config)
-        training_games = []
-        for bomb_list in bomb_lists:
-            game = Game(rows, columns, i, net, size, bomb_list, on_game_over)
-            training_games.append(game)
-        ge.append(training_games)
-
-    # while len(ge) > 0:
-    #     for g in ge:
-    #         if len(g) > 0:
-    #             for game in g:
-    #                 if game.game_over:
-    #                     g.remove(game)
-    #                 else:
-    #                     game.activate_net()
-    #         else:
-    #             ge.remove(g)
-
-    pool = concurrent.futures.ThreadPoolExecutor()
-    for t_id in range(num_threads):
-        divided_len = int(len(genomes) / num_threads)
-        divided_ge = ge[t_id * divided_len:t_id * divided_len + divided_len]
-        pool.submit(run_sims, divided_ge)
-
-    pool.shutdown(wait=True)
-
-
+    genome_list = [genome for genome_id, genome in genomes]
+    play = lambda genome_list: play_genomes(genome_list, config, training_set, halving=halving,
+                                            move_selector=move_selector, patches=patches)
+    if fitness_cache is None:
+        for genome, fitness in zip(genome_list, play(genome_list)):
+            genome.fitness = fitness
+        return
+    fitness_cache.evaluate(genome_list, config, training_set.id, play, halving)
 
 
 def run(config_path):
@@ -80,28 +87,77 @@ def run(config_path):
     )
 
     pop = neat.Population(config)
-    # pop = neat.Checkpointer.restore_checkpoint('neat-checkpoint-720')
+    # pop = ColumnarCheckpointer.restore_checkpoint('neat-checkpoint-720.npz')
+    # (and StatsReporter(stats_path, append=True) below, to continue the statistics file)
+    if halving is not None:
+        halving.species_set = pop.species
 
     pop.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    pop.add_reporter(stats)
-    pop.add_reporter(neat.Checkpointer(10))
-
-    winner = pop.run(eval_genomes, 5000)
+    pop.add_reporter(StatsReporter(stats_path))
+    checkpointer = ColumnarCheckpointer(10)
+    pop.add_reporter(checkpointer)
+    if profile_path is not None:
+        pop.add_reporter(ProfilingReporter(profile_path))
+
+    if curriculum_stages is not None:
+        evaluator = Curriculum(curriculum_stages, training_size, seed, num_workers, os.path.dirname(training_set_path),
+                               cache=fitness_cache, move_selector=move_selector)
+        pop.add_reporter(evaluator)
+    elif distributed_address is None:
+        evaluator = ProcessEvaluator(num_workers, config, training_set, cache=fitness_cache, log_dir=move_log_dir,
+                                     halving=halving, move_selector=move_selector, patches=patches)
+    else:
+        evaluator = DistributedEvaluator(distributed_address, config, training_set, cache=fitness_cache,
+                                         halving=halving, move_selector=move_selector, patches=patches)
+        start_local_workers(local_workers, evaluator.address)
+    if report_deductions:
+        # A curriculum moves on to new training sets, so the reporter asks for the current one each time.
+        current_set = (lambda: training_set) if curriculum_stages is None else (lambda: evaluator.training_set)
+        pop.add_reporter(DeductionReporter(current_set, patches, move_selector))
+    winner = pop.run(evaluator.evaluate, 5000)
+    if curriculum_stages is not None and evaluator.best_genome is not None:
+        # pop.run compares fitness across stages; keep the best genome on the boards the curriculum reached.
+        winner = evaluator.best_genome
+    evaluator.close()
+    checkpointer.close()
 
     visualize.draw_net(config, winner, True)
-    visualize.plot_stats(stats, ylog=False, view=False)
-    visualize.plot_species(stats, view=False)
+    visualize.plot_stats(stats_path, ylog=False, view=False)
+    visualize.plot_species(stats_path, view=False)
 
-    net = neat.nn.FeedForwardNetwork.create(winner, config)
     print(f"Best fitness: {winner.fitness}")
 
-    window = GameWindow(rows, columns, 0, net, size, bomb_lists[0], lambda a, b: None)
+    # A curriculum's winner plays the boards of the stage it reached.
+    play_set = training_set if curriculum_stages is None else evaluator.training_set
+    if headless:
+        record_winner(winner, config, play_set, patches)
+        return
+
+    # game_window loads its sprites through pyglet on import, which needs a display.
+    import pyglet
+    from game_window import GameWindow
+
+    if patches:
+        net = create_net(winner, config, play_set, patches)
+    else:
+        net = neat.nn.FeedForwardNetwork.create(winner, config)
+    window = GameWindow(play_set.rows, play_set.columns, 0, net, size,
+                        get_bomb_lists(play_set.bombs[:1], play_set.columns)[0], lambda a, b: None, move_selector)
     pyglet.app.run()
 
 
+def record_winner(winner, config, play_set, patches=False):
+    net = create_net(winner, config, play_set, patches)
+    renderer = BoardRenderer(play_set.rows, play_set.columns, size // play_set.columns)
+    games = play_set.create_games()
+    boards = list(range(min(num_recordings, len(play_set))))
+    frames = record_games(games, lambda playing, states: net.activate_batch(states), renderer, boards, move_selector)
+    for i in boards:
+        save_video(frames[:, i], f"recording-{i}.mp4", fps=recording_fps)
+
+
 
 if __name__ == '__main__':
     local_dir = os.path.dirname(__file__)
-    config_path = os.path.join(local_dir, 'config.txt')
+    config_path = os.path.join(local_dir, 'config-patch.txt' if patches else 'config.txt')
     run(config_path)
@@ -0,0 +1,116 @@
+import glob
+import os
+
+import numpy as np
+
+from batch_game import BatchGame, no_tile
+from game import Game, move_limit, move_penalty
+from layouts import get_bomb_lists
+
+magic = b'MSMOVES2'
+move_dtype = np.dtype([('evaluation', '<i4'), ('genome', '<i4'), ('board', '<i4'), ('tile', '<i4'), ('fitness', '<f4')])
+
+
+class MoveLogWriter:
+    """ Streams moves to a new binary log of fixed 20 byte records through a preallocated buffer.
+
+    Each record is the evaluation it was played in, a genome key, a training set board index, the
+    flat tile index clicked (no_tile when the move only ran out the move limit) and the fitness the
+    move added. A board finished in closed form by stop_at_fixed_points logs its last move once, with
+    the fitness of every repeat. Set evaluation before playing each evaluation's moves, since the same
+    genome can play the same board again, e.g. in a later generation.
+    """
+
+    def __init__(self, path, buffer_size=1 << 16):
+        # Never append: moves of another run under the same name would merge into its games.
+        self.file = open(path, 'xb')
+        self.file.write(magic)
+        self.buffer = np.empty(buffer_size, dtype=move_dtype)
+        self.count = 0
+        self.evaluation = 0
+
+    def __del__(self):
+        self.close()
+
+    def write(self, genomes, boards, tiles, fitness):
+        start = 0
+        while start < len(boards):
+            end = min(len(boards), start + len(self.buffer) - self.count)
+            chunk = self.buffer[self.count:self.count + end - start]
+            chunk['evaluation'] = self.evaluation
+            chunk['genome'] = genomes[start:end]
+            chunk['board'] = boards[start:end]
+            chunk['tile'] = tiles[start:end]
+            chunk['fitness'] = fitness[start:end]
+            self.count += end - start
+            start = end
+            if self.count == len(self.buffer):
+                self.flush()
+
+    def flush(self):
+        if self.count:
+            self.file.write(self.buffer[:self.count].tobytes())
+            self.count = 0
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None and not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_moves(path):
+    """ Reads a log file, or every *.bin log in a run's directory (one per evaluator process), into a record array. """
+    if os.path.isdir(path):
+        logs = [read_moves(log) for log in sorted(glob.glob(os.path.join(path, '*.bin')))]
+        return np.concatenate(logs) if logs else np.empty(0, dtype=move_dtype)
+    with open(path, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a move log")
+    return np.fromfile(path, dtype=move_dtype, offset=len(magic))
+
+
+def get_game_moves(moves, genome, board, evaluation=None):
+    """ Returns the moves of genome on board in evaluation (by default its last), in the order they were played. """
+    game_moves = moves[(moves['genome'] == genome) & (moves['board'] == board)]
+    if evaluation is None and len(game_moves):
+        evaluation = game_moves['evaluation'].max()
+    return game_moves[game_moves['evaluation'] == evaluation]
+
+
+def replay_game(training_set, game_moves, size=512, on_game_over=lambda fitness, index: None):
+    """ Rebuilds the Game a genome played on one training set board from its logged moves.
+
+    A board finished in closed form logged its last move once; that move is repeated until the game
+    runs out of moves, as it was during play. The game reports the fitness the logged moves add up to
+    to on_game_over; on a lost game, game.fitness also holds the bomb_penalty Game adds after reporting.
+    """
+    board = int(game_moves['board'][0])
+    bomb_list = get_bomb_lists(training_set.bombs[board:board + 1], training_set.columns)[0]
+    game = Game(training_set.rows, training_set.columns, board, None, size, bomb_list, on_game_over)
+    tiles = game_moves['tile'].tolist()
+    while tiles and not game.game_over:
+        # The last tile is kept for the repeats; a no_tile move is always the last and ends the game.
+        tile = tiles.pop(0) if len(tiles) > 1 or tiles[0] == no_tile else tiles[0]
+        game.moves += 1
+        game.fitness += move_penalty
+        if game.moves > move_limit:
+            game.game_over = True
+            game.on_game_over(game.fitness, game.index)
+        else:
+            x, y = divmod(tile, training_set.columns)
+            game.handle_tile_click(game.tiles[x][y], x, y)
+    return game
+
+
+def replay_frames(training_set, game_moves, renderer):
+    """ Renders the opening and the state after every logged move, as (moves + 1, height, width, 3) frames. """
+    board = int(game_moves['board'][0])
+    games = BatchGame(training_set.rows, training_set.columns, training_set.bombs[board:board + 1],
+                      training_set.touching[board:board + 1], training_set.revealed[board:board + 1])
+    frames = [renderer.render_games(games)[0]]
+    for tile in game_moves['tile']:
+        if tile != no_tile:
+            games.handle_tile_click(np.zeros(1, dtype=np.intp), np.array([tile], dtype=np.intp))
+        frames.append(renderer.render_games(games)[0])
+    return np.stack(frames)
@@ -0,0 +1,60 @@
+import copy
+
+import numpy as np
+
+policies = ('argmax', 'top_k', 'softmax')
+
+
+class MoveSelector:
+    """ Picks each board's move from a (boards, tiles) array of net outputs.
+
+    'argmax' takes the first highest output, as Game always has. 'top_k' samples among the k highest
+    outputs and 'softmax' among all of them, both with probabilities softmax(output / temperature).
+    With mask_illegal, revealed and flagged tiles are never picked unless a board has no other tile,
+    so no move is spent on a click that cannot reveal anything.
+
+    A pickled selector carries its generator's state along, so every process that receives a copy
+    must spawn() its own stream before sampling.
+    """
+
+    def __init__(self, policy='argmax', mask_illegal=False, k=3, temperature=1.0, seed=None):
+        if policy not in policies:
+            raise ValueError(f"Unknown move selection policy {policy!r}, expected one of {policies}")
+        self.policy = policy
+        self.mask_illegal = mask_illegal
+        self.k = k
+        self.temperature = temperature
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+
+    @property
+    def deterministic(self):
+        """ Whether the same outputs always give the same move, which stop_at_fixed_points relies on. """
+        return self.policy == 'argmax'
+
+    def spawn(self, key):
+        """ Returns a copy with its own random stream, derived from this selector's seed and key (e.g. a worker id). """
+        selector = copy.copy(self)
+        selector.rng = np.random.default_rng(np.random.SeedSequence(
+            self.seed_sequence.entropy, spawn_key=self.seed_sequence.spawn_key + (key,)))
+        return selector
+
+    def __call__(self, output, revealed, flagged):
+        """ Returns the flat tile index chosen on each board, given its outputs and revealed and flagged masks. """
+        scores = np.array(output, dtype=np.float64)
+        if self.mask_illegal:
+            illegal = np.asarray(revealed, dtype=bool) | np.asarray(flagged, dtype=bool)
+            illegal &= ~illegal.all(axis=1, keepdims=True)
+            scores[illegal] = -np.inf
+        if self.policy == 'argmax':
+            return np.argmax(scores, axis=1)
+
+        if self.policy == 'top_k' and self.k < scores.shape[1]:
+            kth = np.partition(scores, -self.k, axis=1)[:, -self.k, np.newaxis]
+            scores[scores < kth] = -np.inf
+        # Gumbel-max trick: adding Gumbel noise and taking the argmax samples from the softmax.
+        return np.argmax(scores / self.temperature + self.rng.gumbel(size=scores.shape), axis=1)
+
+
+# Shared by every Game that is not given its own selector.
+argmax_selector = MoveSelector()
@@ -0,0 +1,44 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def get_neighbor_table(rows, columns):
+    """ Returns a read-only (rows * columns, 8) array of the flat indices of each tile's 8-neighbors.
+
+    Tiles on an edge or corner have fewer neighbors; their unused slots hold rows * columns, one past
+    the last tile, so callers can either filter them out or index into an array with one extra entry.
+    Built once per board shape and shared by every board of that shape.
+    """
+    x, y = np.divmod(np.arange(rows * columns), columns)
+    table = np.full((rows * columns, 8), rows * columns, dtype=np.intp)
+    counts = np.zeros(rows * columns, dtype=np.intp)
+    for temp_x in range(-1, 2):
+        for temp_y in range(-1, 2):
+            if temp_x == 0 and temp_y == 0:
+                continue
+            final_x = x + temp_x
+            final_y = y + temp_y
+            inside = np.flatnonzero((final_x >= 0) & (final_x < rows) & (final_y >= 0) & (final_y < columns))
+            table[inside, counts[inside]] = final_x[inside] * columns + final_y[inside]
+            counts[inside] += 1
+    table.setflags(write=False)
+    return table
+
+
+@lru_cache(maxsize=None)
+def get_neighbor_lists(rows, columns):
+    """ Returns the same neighbors as (x, y) tuples, indexed [x][y], for the per-tile Game objects. """
+    table = get_neighbor_table(rows, columns)
+    return tuple(
+        tuple(tuple(tuple(divmod(int(i), columns)) for i in table[x * columns + y] if i < rows * columns)
+              for y in range(columns))
+        for x in range(rows))
+
+
+@lru_cache(maxsize=None)
+def get_flat_neighbor_lists(rows, columns):
+    """ Returns the same neighbors as tuples of flat indices, one per tile, for Board-backed Games. """
+    table = get_neighbor_table(rows, columns)
+    return tuple(tuple(int(i) for i in neighbors if i < rows * columns) for neighbors in table)
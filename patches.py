@@ -0,0 +1,88 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from compiled_net import CompiledNetwork
+
+# Input for the parts of a patch that fall outside the board; visible tiles are -1 (hidden) or 0-8.
+off_board = -2
+num_values = 8 - off_board + 1
+# Patch cells packed into each dedup key: num_values ** 13 still fits a float64's 53-bit mantissa exactly.
+cells_per_key = 13
+
+
+@lru_cache(maxsize=None)
+def get_patch_table(rows, columns, patch_size):
+    """ Returns a read-only (rows * columns, patch_size ** 2) array of the flat indices of each tile's patch.
+
+    A tile's patch is the patch_size x patch_size square centred on it, row-major. Slots outside the
+    board hold rows * columns, one past the last tile, like get_neighbor_table.
+    """
+    if patch_size % 2 == 0:
+        raise ValueError(f"Patches must have an odd size to be centred on a tile, got {patch_size}")
+    x, y = np.divmod(np.arange(rows * columns), columns)
+    offset_x, offset_y = np.divmod(np.arange(patch_size ** 2), patch_size)
+    patch_x = x[:, np.newaxis] + offset_x - patch_size // 2
+    patch_y = y[:, np.newaxis] + offset_y - patch_size // 2
+    inside = (patch_x >= 0) & (patch_x < rows) & (patch_y >= 0) & (patch_y < columns)
+    table = np.where(inside, patch_x * columns + patch_y, rows * columns)
+    table.setflags(write=False)
+    return table
+
+
+class PatchNetwork:
+    """ Scores every tile of a board with one small network that sees only the patch around the tile.
+
+    The network has patch_size ** 2 inputs and one output, so the same genome plays boards of any
+    size and its cost grows linearly with the number of tiles. Its activate and activate_batch take
+    and return whole boards, like a CompiledNetwork with one input and one output per tile.
+
+    Most patches of a batch repeat (hidden interiors, the same opening edges on every board), so each
+    distinct patch is activated only once. Patches are told apart by exact integer keys, packing
+    cells_per_key cells into each float64 column.
+    """
+
+    def __init__(self, net, rows, columns, patch_size):
+        self.net = net
+        self.rows = rows
+        self.columns = columns
+        self.patch_size = patch_size
+        self.table = get_patch_table(rows, columns, patch_size)
+        cells = patch_size ** 2
+        self.key_weights = np.zeros((cells, -(-cells // cells_per_key)))
+        for i in range(cells):
+            self.key_weights[i, i // cells_per_key] = num_values ** (i % cells_per_key)
+
+    def activate(self, inputs):
+        return self.activate_batch([inputs])[0].tolist()
+
+    def activate_batch(self, states):
+        states = np.asarray(states)
+        padded = np.full((len(states), self.rows * self.columns + 1), off_board, dtype=np.int8)
+        padded[:, :-1] = states
+        patches = padded[:, self.table].reshape(-1, self.patch_size ** 2)
+        unique, inverse = self.get_unique(patches)
+        return self.net.activate_batch(patches[unique])[inverse].reshape(len(states), self.rows * self.columns)
+
+    def get_unique(self, patches):
+        """ Returns the index of one of each distinct patch and, for every patch, which of those it is. """
+        keys = (patches - float(off_board)) @ self.key_weights
+        # Complex numbers sort by real then imaginary part, which lets np.unique compare two keys at once.
+        ids = keys[:, 0]
+        for column in keys[:, 1:-1].T:
+            ids = np.unique(ids + 1j * column, return_inverse=True)[1]
+        if keys.shape[1] > 1:
+            ids = ids + 1j * keys[:, -1]
+        _, unique, inverse = np.unique(ids, return_index=True, return_inverse=True)
+        return unique, inverse
+
+    @staticmethod
+    def create(genome, config, rows, columns):
+        """ Compiles a genome of a patch config (e.g. config-patch.txt) for rows x columns boards. """
+        genome_config = config.genome_config
+        patch_size = math.isqrt(genome_config.num_inputs)
+        if patch_size ** 2 != genome_config.num_inputs or genome_config.num_outputs != 1:
+            raise ValueError("A patch network needs a square number of inputs and one output, got "
+                             f"{genome_config.num_inputs} and {genome_config.num_outputs}")
+        return PatchNetwork(CompiledNetwork.create(genome, config), rows, columns, patch_size)
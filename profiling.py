@@ -0,0 +1,149 @@
+import csv
+import json
+import time
+from collections import defaultdict
+from functools import wraps
+
+import neat
+import numpy as np
+from neat.nn import FeedForwardNetwork
+
+from batch_game import BatchGame
+from compiled_net import CompiledNetwork
+from game import Game
+
+# Methods timed while profiling is enabled. Times are inclusive, so e.g. BatchGame.activate_net
+# contains the CompiledNetwork.activate_batch and BatchGame.reveal_from calls it makes.
+hooks = [
+    (Game, '__init__'), (Game, 'get_net_output'), (Game, 'handle_tile_click'), (Game, 'reveal_from'),
+    (Game, 'check_game_win'), (FeedForwardNetwork, 'activate'),
+    (BatchGame, 'activate_net'), (BatchGame, 'handle_tile_click'), (BatchGame, 'reveal_from'),
+    (BatchGame, 'check_game_win'), (CompiledNetwork, 'activate_batch'),
+]
+percentiles = (50, 90, 99)
+
+# Phase name -> list of seconds, or None while profiling is disabled.
+samples = None
+originals = {}
+
+
+def timed(phase, method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            samples[phase].append(time.perf_counter() - start)
+    return wrapper
+
+
+def enable():
+    """ Starts recording. The hooked methods are only wrapped while enabled, so disabled profiling costs nothing. """
+    global samples
+    if samples is not None:
+        return
+    samples = defaultdict(list)
+    for cls, name in hooks:
+        method = cls.__dict__[name]
+        originals[cls, name] = method
+        setattr(cls, name, timed(f"{cls.__name__}.{name}", method))
+
+
+def disable():
+    global samples
+    for (cls, name), method in originals.items():
+        setattr(cls, name, method)
+    originals.clear()
+    samples = None
+
+
+def is_enabled():
+    return samples is not None
+
+
+def record(phase, seconds):
+    if samples is not None:
+        samples[phase].append(seconds)
+
+
+def drain():
+    """ Returns and clears everything recorded so far, e.g. to ship it from a worker process. """
+    if samples is None:
+        return {}
+    drained = dict(samples)
+    samples.clear()
+    return drained
+
+
+def merge(other):
+    if samples is not None:
+        for phase, seconds in other.items():
+            samples[phase].extend(seconds)
+
+
+def summarize(phase_samples):
+    """ Returns count, total, mean, max and percentiles of each phase's samples, in seconds. """
+    summary = {}
+    for phase, seconds in sorted(phase_samples.items()):
+        seconds = np.asarray(seconds)
+        summary[phase] = {'count': len(seconds), 'total': float(seconds.sum()), 'mean': float(seconds.mean()),
+                          'max': float(seconds.max())}
+        for p, value in zip(percentiles, np.percentile(seconds, percentiles)):
+            summary[phase][f'p{p}'] = float(value)
+    return summary
+
+
+class ProfilingReporter(neat.reporting.BaseReporter):
+    """ Writes per-phase timings for every generation to path, as CSV rows or as one JSON object per line.
+
+    Besides the hooked methods, 'generation' and 'evaluate' record the wall time of the whole
+    generation and of the fitness function. Workers of a ProcessEvaluator created after this
+    reporter record their own timings and send them back with their results.
+    """
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt or ('json' if path.endswith('.json') else 'csv')
+        self.generation = None
+        self.generation_start = None
+        enable()
+        if self.fmt == 'csv':
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerow(self.get_columns())
+        else:
+            open(path, 'w').close()
+
+    @staticmethod
+    def get_columns():
+        return ['generation', 'phase', 'count', 'total', 'mean', 'max'] + [f'p{p}' for p in percentiles]
+
+    def start_generation(self, generation):
+        self.generation = generation
+        drain()
+        self.generation_start = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        record('evaluate', time.perf_counter() - self.generation_start)
+
+    def end_generation(self, config, population, species_set):
+        self.write_generation()
+
+    def found_solution(self, config, generation, best):
+        # Population.run stops before end_generation once the fitness threshold is reached.
+        if self.generation_start is not None:
+            self.write_generation()
+
+    def write_generation(self):
+        record('generation', time.perf_counter() - self.generation_start)
+        self.generation_start = None
+        summary = summarize(drain())
+        if self.fmt == 'csv':
+            with open(self.path, 'a', newline='') as f:
+                writer = csv.writer(f)
+                for phase, stats in summary.items():
+                    writer.writerow([self.generation, phase] + [stats[c] for c in self.get_columns()[2:]])
+        else:
+            with open(self.path, 'a') as f:
+                json.dump({'generation': self.generation, 'phases': summary}, f)
+                f.write('\n')
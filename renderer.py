@@ -0,0 +1,103 @@
+import os
+
+import imageio.v2 as iio
+import numpy as np
+
+from game import LIGHT_GRAY, GRAY, RED, TOUCHING_COLORS
+
+local_dir = os.path.dirname(__file__)
+
+# 3x5 bitmaps for the touching counts, scaled up to the tile size.
+DIGITS = {
+    1: ["010", "110", "010", "010", "111"],
+    2: ["111", "001", "111", "100", "111"],
+    3: ["111", "001", "111", "001", "111"],
+    4: ["101", "101", "111", "001", "001"],
+    5: ["111", "100", "111", "001", "111"],
+    6: ["111", "100", "111", "101", "111"],
+    7: ["111", "001", "010", "010", "010"],
+    8: ["111", "101", "111", "101", "111"],
+}
+
+HIDDEN = 9
+FLAGGED = 10
+BOMB = 11
+
+
+class BoardRenderer:
+    """ Rasterizes boards straight into RGB NumPy frames without a window or GL.
+
+    Every tile look (revealed 0-8, hidden, flagged, exploded bomb) is drawn once into a sprite atlas;
+    a frame is then just the atlas indexed by each tile's sprite id. Frames match GameWindow's layout:
+    tile (x, y) is x tiles from the left and y tiles up from the bottom, inset by offset pixels.
+    """
+
+    def __init__(self, rows, columns, tile_size=32, offset=4):
+        self.rows = rows
+        self.columns = columns
+        self.tile_size = tile_size
+        self.offset = offset
+        self.atlas = self.create_atlas()
+
+    def create_atlas(self):
+        inner = self.tile_size - self.offset * 2
+        atlas = np.zeros((12, self.tile_size, self.tile_size, 3), dtype=np.uint8)
+        body = (slice(None), slice(self.offset, self.offset + inner), slice(self.offset, self.offset + inner))
+        atlas[body] = LIGHT_GRAY
+        atlas[HIDDEN][body[1:]] = GRAY
+        atlas[FLAGGED][body[1:]] = GRAY
+        atlas[BOMB][body[1:]] = RED
+
+        scale = max(1, inner // 8)
+        for touching, bitmap in DIGITS.items():
+            glyph = np.kron(np.array([[c == '1' for c in row] for row in bitmap]), np.ones((scale, scale), dtype=bool))
+            top = (self.tile_size - glyph.shape[0]) // 2
+            left = (self.tile_size - glyph.shape[1]) // 2
+            atlas[touching, top:top + glyph.shape[0], left:left + glyph.shape[1]][glyph] = TOUCHING_COLORS[touching]
+
+        for index, filename in ((FLAGGED, 'flag.png'), (BOMB, 'bomb.png')):
+            image = iio.imread(os.path.join(local_dir, filename), pilmode='RGBA')
+            picks = np.arange(inner) * image.shape[0] // inner
+            image = image[picks][:, picks].astype(np.float64)
+            alpha = image[:, :, 3:] / 255
+            tile = atlas[index][body[1:]]
+            atlas[index][body[1:]] = (image[:, :, :3] * alpha + tile * (1 - alpha)).astype(np.uint8)
+        return atlas
+
+    def get_sprites(self, bombs, touching, revealed, flagged):
+        # Same precedence as BoardView.update_tile: a flag hides everything, then exploded bombs, then counts.
+        sprites = np.where(revealed, touching, HIDDEN).astype(np.intp)
+        sprites[revealed & bombs] = BOMB
+        sprites[flagged] = FLAGGED
+        return sprites
+
+    def render(self, bombs, touching, revealed, flagged):
+        """ Renders (boards, rows * columns) tile arrays into (boards, height, width, 3) frames. """
+        sprites = self.get_sprites(np.asarray(bombs), np.asarray(touching), np.asarray(revealed), np.asarray(flagged))
+        # Screen columns follow x and screen rows follow y from the bottom up.
+        sprites = sprites.reshape(-1, self.rows, self.columns)[:, :, ::-1]
+        tiles = self.atlas[sprites]
+        frames = tiles.transpose(0, 2, 3, 1, 4, 5)
+        return frames.reshape(len(sprites), self.columns * self.tile_size, self.rows * self.tile_size, 3)
+
+    def render_games(self, games, boards=None):
+        """ Renders the current state of the given boards of a BatchGame. """
+        if boards is None:
+            boards = np.arange(games.num_boards)
+        return self.render(games.bombs[boards], games.touching[boards], games.revealed[boards], games.flagged[boards])
+
+
+def record_games(games, get_outputs, renderer, boards=None, select_moves=None):
+    """ Plays games to the end, returning a (moves + 1, boards, height, width, 3) array of every state. """
+    frames = [renderer.render_games(games, boards)]
+    while not games.game_over.all():
+        games.activate_net(get_outputs, select_moves=select_moves)
+        frames.append(renderer.render_games(games, boards))
+    return np.stack(frames)
+
+
+def save_video(frames, filename, fps=1):
+    writer = iio.get_writer(filename, fps=fps)
+    for frame in frames:
+        writer.append_data(frame)
+    writer.close()
@@ -0,0 +1,278 @@
+from collections import OrderedDict
+
+import neat
+import numpy as np
+
+from batch_game import no_tile
+from evaluator import create_net
+from game import move_limit
+from neighbors import get_flat_neighbor_lists
+
+
+def get_constraints(state, neighbors):
+    """ Returns a [hidden neighbors, bombs among them] pair for every revealed count next to a hidden tile. """
+    constraints = []
+    for i, touching in enumerate(state):
+        if touching > 0:
+            hidden = {j for j in neighbors[i] if state[j] < 0}
+            if hidden:
+                constraints.append([hidden, int(touching)])
+    return constraints
+
+
+def propagate(constraints, safe, mines):
+    """ Adds every tile the constraints force to safe or mines, updating the constraints in place.
+
+    Applies the single constraint rules (no bombs left: all safe; as many bombs as tiles: all bombs)
+    and the subset rule (if one constraint's tiles are a subset of another's, the difference holds
+    the difference in bombs) until nothing changes.
+    """
+    changed = True
+    while changed:
+        changed = False
+        for constraint in constraints:
+            tiles, bombs = constraint
+            known_mines = tiles & mines
+            if known_mines or tiles & safe:
+                tiles -= safe | mines
+                bombs -= len(known_mines)
+                constraint[1] = bombs
+            if tiles and bombs == 0:
+                safe |= tiles
+                changed = True
+            elif tiles and bombs == len(tiles):
+                mines |= tiles
+                changed = True
+        constraints[:] = [c for c in constraints if c[0]]
+
+        for a_tiles, a_bombs in constraints:
+            for b_tiles, b_bombs in constraints:
+                if a_tiles is b_tiles or not a_tiles < b_tiles:
+                    continue
+                rest = b_tiles - a_tiles
+                if b_bombs == a_bombs:
+                    safe |= rest
+                    changed = True
+                elif b_bombs - a_bombs == len(rest):
+                    mines |= rest
+                    changed = True
+            if changed:
+                break
+
+
+def get_components(constraints):
+    """ Splits constraints into groups that share no tiles, returning each group's tiles and constraints. """
+    components = []
+    for constraint in constraints:
+        joined = [c for c in components if c[0] & constraint[0]]
+        tiles = set(constraint[0]).union(*(c[0] for c in joined))
+        members = [constraint] + [m for c in joined for m in c[1]]
+        components = [c for c in components if all(c is not j for j in joined)] + [(tiles, members)]
+    return components
+
+
+def enumerate_component(tiles, constraints):
+    """ Enumerates every bomb placement on tiles that meets constraints.
+
+    Returns {number of bombs: (tiles that are a bomb in some placement, tiles that are safe in some placement)}.
+    """
+    tiles = sorted(tiles)
+    position = {tile: i for i, tile in enumerate(tiles)}
+    # For each tile, the constraints it appears in; each constraint tracks bombs left and tiles left.
+    tile_constraints = [[] for _ in tiles]
+    left = []
+    for k, (constraint_tiles, bombs) in enumerate(constraints):
+        left.append([bombs, len(constraint_tiles)])
+        for tile in constraint_tiles:
+            tile_constraints[position[tile]].append(k)
+    assignment = [False] * len(tiles)
+    results = {}
+
+    def place(i, count):
+        if i == len(tiles):
+            bomb_tiles, safe_tiles = results.setdefault(count, (set(), set()))
+            for tile, bomb in zip(tiles, assignment):
+                (bomb_tiles if bomb else safe_tiles).add(tile)
+            return
+        for bomb in (False, True):
+            ok = True
+            for k in tile_constraints[i]:
+                left[k][0] -= bomb
+                left[k][1] -= 1
+                ok = ok and 0 <= left[k][0] <= left[k][1]
+            if ok:
+                assignment[i] = bomb
+                place(i + 1, count + bomb)
+            for k in tile_constraints[i]:
+                left[k][0] += bomb
+                left[k][1] += 1
+
+    place(0, 0)
+    return results
+
+
+def get_sums(count_sets):
+    sums = {0}
+    for counts in count_sets:
+        sums = {s + c for s in sums for c in counts}
+    return sums
+
+
+class Oracle:
+    """ Finds the tiles a perfect player could deduce to be safe or bombs from a visible board state.
+
+    States are flat arrays of -1 (hidden) and revealed touching counts, as BatchGame.get_visible_states
+    returns them. Constraint propagation settles most tiles; the rest of the frontier is split into
+    independent groups that are enumerated exactly, together with the total number of bombs, so the
+    answer is exact unless a group has more than max_enumerate tiles, in which case that group's
+    tiles are left undecided. Results are kept in an LRU cache of max_size states, since the same
+    states come up over and over across genomes and generations.
+    """
+
+    def __init__(self, max_enumerate=24, max_size=100000):
+        self.max_enumerate = max_enumerate
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def solve(self, rows, columns, state, num_bombs):
+        """ Returns (safe, mines) bool masks of the hidden tiles that are certainly safe and certainly bombs. """
+        state = np.asarray(state, dtype=np.int8)
+        key = (rows, columns, num_bombs, state.tobytes())
+        result = self.entries.get(key)
+        if result is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return result
+
+        self.misses += 1
+        safe, mines = self.deduce(state, get_flat_neighbor_lists(rows, columns), num_bombs)
+        result = np.zeros(len(state), dtype=bool), np.zeros(len(state), dtype=bool)
+        result[0][list(safe)] = True
+        result[1][list(mines)] = True
+        self.entries[key] = result
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return result
+
+    def deduce(self, state, neighbors, num_bombs):
+        safe, mines = set(), set()
+        constraints = get_constraints(state, neighbors)
+        propagate(constraints, safe, mines)
+
+        hidden = {i for i, touching in enumerate(state) if touching < 0}
+        frontier = set().union(*(tiles for tiles, bombs in constraints))
+        interior = len(hidden - frontier - safe - mines)
+        bombs_left = num_bombs - len(mines)
+
+        components = []
+        for tiles, members in get_components(constraints):
+            if len(tiles) <= self.max_enumerate:
+                components.append((tiles, enumerate_component(tiles, members)))
+            else:
+                # Too big to enumerate: allow any count, which keeps every other conclusion sound.
+                components.append((tiles, {count: (tiles, tiles) for count in range(len(tiles) + 1)}))
+
+        feasible_totals = set()
+        for i, (tiles, results) in enumerate(components):
+            others = get_sums(r.keys() for j, (t, r) in enumerate(components) if j != i)
+            maybe_bomb, maybe_safe = set(), set()
+            for count, (bomb_tiles, safe_tiles) in results.items():
+                totals = {count + s for s in others if 0 <= bombs_left - count - s <= interior}
+                if totals:
+                    maybe_bomb |= bomb_tiles
+                    maybe_safe |= safe_tiles
+                    feasible_totals |= totals
+            safe |= tiles - maybe_bomb
+            mines |= tiles - maybe_safe
+
+        if not components:
+            feasible_totals = {0} if 0 <= bombs_left <= interior else set()
+        interior_bombs = {bombs_left - total for total in feasible_totals}
+        if interior and interior_bombs in ({0}, {interior}):
+            interior_tiles = hidden - frontier - safe - mines
+            (safe if interior_bombs == {0} else mines).update(interior_tiles)
+        return safe, mines
+
+    def get_solvable(self, training_set):
+        """ Returns a bool per board of training_set: whether it can be won from the opening without guessing. """
+        games = training_set.create_games()
+        num_bombs = games.bombs.sum(axis=1)
+        stuck = np.zeros(len(training_set), dtype=bool)
+        while True:
+            won = (games.revealed | games.bombs).all(axis=1)
+            boards = np.flatnonzero(~won & ~stuck)
+            if not len(boards):
+                return won
+            click_boards, click_tiles = [], []
+            for board, state in zip(boards, games.get_visible_states(boards)):
+                tiles = np.flatnonzero(self.solve(games.rows, games.columns, state, num_bombs[board])[0])
+                stuck[board] = not len(tiles)
+                click_boards.extend([board] * len(tiles))
+                click_tiles.extend(tiles)
+            # Every deducible tile is revealed at once, flooding from zeros as a click would.
+            click_boards, click_tiles = np.array(click_boards, dtype=np.intp), np.array(click_tiles, dtype=np.intp)
+            games.revealed[click_boards, click_tiles] = True
+            zero = games.touching[click_boards, click_tiles] == 0
+            games.reveal_from(click_boards[zero], click_tiles[zero])
+
+
+def get_deduction_stats(net, training_set, oracle, move_selector=None):
+    """ Plays net on every board of training_set and counts its moves against the Oracle.
+
+    Returns (available, found): the moves made in a state with at least one deducible safe tile, and
+    how many of those clicked one. With a deterministic selector, a board stuck repeating a move is
+    finished in closed form as in play_boards, and its repeats count as that many moves.
+    """
+    games = training_set.create_games()
+    num_bombs = games.bombs.sum(axis=1)
+    stop_at_fixed_points = move_selector is None or move_selector.deterministic
+    states = {}
+    counts = [0, 0]
+
+    def get_outputs(boards, visible_states):
+        states.update(zip(boards.tolist(), visible_states))
+        return net.activate_batch(visible_states)
+
+    def on_moves(boards, tiles, fitness):
+        for board, tile in zip(boards.tolist(), tiles.tolist()):
+            if tile == no_tile:
+                continue
+            safe = oracle.solve(games.rows, games.columns, states[board], num_bombs[board])[0]
+            if safe.any():
+                # A stuck board jumps to move_limit + 1; it would have made this move until move_limit.
+                repeats = int(move_limit - moves[board]) if games.moves[board] > move_limit else 1
+                counts[0] += repeats
+                counts[1] += repeats * bool(safe[tile])
+
+    while not games.game_over.all():
+        moves = games.moves.copy()
+        games.activate_net(get_outputs, stop_at_fixed_points, on_moves, move_selector)
+    return tuple(counts)
+
+
+class DeductionReporter(neat.reporting.BaseReporter):
+    """ Reports which fraction of its deducible moves each generation's best genome found.
+
+    A move counts when the board it was made on had a tile the Oracle could prove safe, and is found
+    when it clicked such a tile. Only the best genome is replayed, on get_training_set(), so the cost
+    is one genome's evaluation plus the uncached solves.
+    """
+
+    def __init__(self, get_training_set, patches=False, move_selector=None, oracle=None):
+        self.get_training_set = get_training_set
+        self.patches = patches
+        self.move_selector = move_selector
+        self.oracle = oracle or Oracle()
+        self.fraction = None
+
+    def post_evaluate(self, config, population, species, best_genome):
+        training_set = self.get_training_set()
+        net = create_net(best_genome, config, training_set, self.patches)
+        available, found = get_deduction_stats(net, training_set, self.oracle, self.move_selector)
+        self.fraction = found / available if available else None
+        if available:
+            print(f"Deducible moves found: {found}/{available} ({self.fraction:.1%})")
+        else:
+            print("Deducible moves found: no deducible moves")
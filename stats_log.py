@@ -0,0 +1,155 @@
+import argparse
+import json
+import time
+
+import neat
+from neat.math_util import mean, stdev
+
+
+class StatsReporter(neat.reporting.BaseReporter):
+    """ Appends one JSON line of per-generation aggregates to path, in place of neat.StatisticsReporter.
+
+    Each line has the generation, the population's mean, stdev and best fitness, the best genome's
+    key, the size of every species, the seconds from the start of the generation to the end of its
+    evaluation and the wall clock time. Nothing is kept in memory between generations, and every
+    line is flushed as it is written, so a StatsLog can follow the file during a run or read it
+    after a crash. With append, a run restored from a checkpoint continues an existing file.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.generation = None
+        self.generation_start = None
+        open(path, 'a' if append else 'w').close()
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.generation_start = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitnesses = [genome.fitness for genome in population.values()]
+        record = {'generation': self.generation, 'mean': mean(fitnesses), 'stdev': stdev(fitnesses),
+                  'best': best_genome.fitness, 'best_key': best_genome.key,
+                  'species': {str(key): len(s.members) for key, s in species.species.items()},
+                  'seconds': time.perf_counter() - self.generation_start, 'time': time.time()}
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+class StatsLog:
+    """ Reads a StatsReporter file incrementally, keeping at most max_points points in memory.
+
+    update() reads only the lines appended since the previous call; a last line that is still being
+    written is left for the next one. Once more than max_points points are held, neighbouring pairs
+    are merged into one, so the points cover 1, 2, 4, ... generations each: a merged point has the
+    mean of the means, stdevs and species sizes and the max of the best fitnesses. Lines that go back
+    to an earlier generation, as after restoring a checkpoint, replace the generations from there on;
+    a merged point that the restored generation falls inside is rebuilt from its lines in the file.
+    The fitness and species getters match those of neat.StatisticsReporter, for visualize.py.
+    """
+
+    def __init__(self, path, max_points=2000):
+        self.path = path
+        self.max_points = max_points
+        self.offset = 0
+        # Number of generations each point covers.
+        self.stride = 1
+        self.points = []
+
+    def update(self):
+        """ Reads any lines appended since the last call and returns the number of points held. """
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for offset, record in self.parse(data[:end], self.offset):
+            self.add(record, offset)
+        self.offset += end
+        return len(self.points)
+
+    @staticmethod
+    def parse(data, offset):
+        """ Yields the file offset and record of every line in data, which starts at offset in the file. """
+        for line in data.splitlines(keepends=True):
+            if line.strip():
+                yield offset, json.loads(line)
+            offset += len(line)
+
+    def add(self, record, offset):
+        """ Adds the record read from the line at offset in the file. """
+        generation = record['generation']
+        point = {'generation': generation, 'last': generation, 'offset': offset, 'count': 1, 'mean': record['mean'],
+                 'stdev': record['stdev'], 'best': record['best'],
+                 'species': {int(key): size for key, size in record['species'].items()}, 'seconds': record['seconds']}
+        while self.points and self.points[-1]['generation'] >= generation:
+            self.points.pop()
+        if self.points and self.points[-1]['last'] >= generation:
+            # The point also covers generations before this one; replay its lines that are still valid.
+            start = self.points.pop()['offset']
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                data = f.read(offset - start)
+            for earlier_offset, earlier in self.parse(data, start):
+                if earlier['generation'] < generation:
+                    self.add(earlier, earlier_offset)
+        last = self.points[-1] if self.points else None
+        if last is not None and last['count'] < self.stride:
+            self.points[-1] = self.merge(last, point)
+        else:
+            self.points.append(point)
+        if len(self.points) > self.max_points:
+            self.stride *= 2
+            self.points = [self.merge(*self.points[i:i + 2]) if i + 1 < len(self.points) else self.points[i]
+                           for i in range(0, len(self.points), 2)]
+
+    @staticmethod
+    def merge(a, b):
+        count = a['count'] + b['count']
+
+        def average(name):
+            return (a[name] * a['count'] + b[name] * b['count']) / count
+
+        species = {key: (a['species'].get(key, 0) * a['count'] + b['species'].get(key, 0) * b['count']) / count
+                   for key in a['species'].keys() | b['species'].keys()}
+        return {'generation': a['generation'], 'last': b['last'], 'offset': a['offset'], 'count': count,
+                'mean': average('mean'), 'stdev': average('stdev'), 'best': max(a['best'], b['best']),
+                'species': species, 'seconds': a['seconds'] + b['seconds']}
+
+    def get_generations(self):
+        return [point['generation'] for point in self.points]
+
+    def get_fitness_mean(self):
+        return [point['mean'] for point in self.points]
+
+    def get_fitness_stdev(self):
+        return [point['stdev'] for point in self.points]
+
+    def get_best_fitness(self):
+        return [point['best'] for point in self.points]
+
+    def get_generation_seconds(self):
+        """ Returns the mean seconds each point's generations took to evaluate. """
+        return [point['seconds'] / point['count'] for point in self.points]
+
+    def get_species_sizes(self):
+        max_species = max((key for point in self.points for key in point['species']), default=0)
+        return [[point['species'].get(key, 0) for key in range(1, max_species + 1)] for point in self.points]
+
+
+if __name__ == '__main__':
+    import visualize
+
+    parser = argparse.ArgumentParser(description="Plots a StatsReporter file, optionally while the run goes on.")
+    parser.add_argument('path')
+    parser.add_argument('--max-points', type=int, default=2000)
+    parser.add_argument('--follow', type=float, metavar='SECONDS', help="replot every SECONDS until interrupted")
+    args = parser.parse_args()
+
+    log = StatsLog(args.path, args.max_points)
+    while True:
+        if log.update():
+            visualize.plot_stats(log)
+            visualize.plot_species(log)
+        if args.follow is None:
+            break
+        time.sleep(args.follow)
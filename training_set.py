@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from batch_game import BatchGame
+from layouts import generate_layouts
+
+arrays = ('bombs', 'touching', 'revealed')
+
+
+class TrainingSet:
+    """ A fixed set of boards with their touching counts and post-opening revealed masks precomputed.
+
+    Saved sets are a directory of .npy files opened memory-mapped, so every evaluator process reads
+    the same pages without copying them. Pickling a saved set only sends its path; the receiving
+    process maps the files itself.
+    """
+
+    def __init__(self, rows, columns, bombs, touching, revealed, path=None, set_id=None):
+        self.rows = rows
+        self.columns = columns
+        self.bombs = bombs
+        self.touching = touching
+        self.revealed = revealed
+        self.path = path
+        if set_id is None:
+            set_id = hashlib.sha1(f"{rows}x{columns}".encode() + np.ascontiguousarray(bombs).tobytes()).hexdigest()
+        self.id = set_id
+
+    def __len__(self):
+        return len(self.bombs)
+
+    def __reduce__(self):
+        if self.path is None:
+            return TrainingSet, (self.rows, self.columns, self.bombs, self.touching, self.revealed)
+        return TrainingSet.load, (self.path,)
+
+    def create_games(self, repeats=1, boards=None):
+        """ Returns a BatchGame holding repeats consecutive copies of every board (or of the boards at the
+        given indices), ready for the first move. """
+        bombs, touching, revealed = self.bombs, self.touching, self.revealed
+        if boards is not None:
+            bombs, touching, revealed = bombs[boards], touching[boards], revealed[boards]
+        return BatchGame(self.rows, self.columns, np.tile(bombs, (repeats, 1)), np.tile(touching, (repeats, 1)),
+                         np.tile(revealed, (repeats, 1)))
+
+    def select(self, boards):
+        """ Returns an unsaved set of the boards at the given indices, or where a bool mask is set. """
+        return TrainingSet(self.rows, self.columns, self.bombs[boards], self.touching[boards], self.revealed[boards])
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in arrays:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'rows': self.rows, 'columns': self.columns, 'size': len(self), 'id': self.id}, f)
+        self.path = path
+
+    @staticmethod
+    def load(path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        loaded = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in arrays]
+        return TrainingSet(meta['rows'], meta['columns'], *loaded, path=path, set_id=meta['id'])
+
+    @staticmethod
+    def create(rows, columns, bomb_mask):
+        games = BatchGame(rows, columns, bomb_mask)
+        return TrainingSet(rows, columns, games.bombs, games.touching, games.revealed)
+
+    @staticmethod
+    def load_or_create(path, rows, columns, num_bombs, size, seed):
+        """ Loads the set saved at path, generating and saving it from seed first if it does not exist. """
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            TrainingSet.create(rows, columns, generate_layouts(rows, columns, num_bombs, size, seed=seed)).save(path)
+        return TrainingSet.load(path)
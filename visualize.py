@@ -4,17 +4,33 @@ import graphviz
 import matplotlib.pyplot as plt
 import numpy as np
 
+from stats_log import StatsLog
+
 import os
 os.environ["PATH"] += os.pathsep + 'C:/Program Files/Graphviz/bin/'
 
+def read_stats(statistics):
+    """ Returns a StatsLog read up to date for a StatsReporter file path or StatsLog, else statistics as is. """
+    if isinstance(statistics, (str, os.PathLike)):
+        statistics = StatsLog(statistics)
+    if isinstance(statistics, StatsLog):
+        statistics.update()
+    return statistics
+
+
 def plot_stats(statistics, ylog=False, view=False, filename='avg_fitness.svg'):
-    """ Plots the population's average and best fitness. """
+    """ Plots the population's average and best fitness, from a StatisticsReporter, StatsLog or StatsReporter file. """
     if plt is None:
         warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
         return
 
-    generation = range(len(statistics.most_fit_genomes))
-    best_fitness = [c.fitness for c in statistics.most_fit_genomes]
+    statistics = read_stats(statistics)
+    if isinstance(statistics, StatsLog):
+        generation = statistics.get_generations()
+        best_fitness = statistics.get_best_fitness()
+    else:
+        generation = range(len(statistics.most_fit_genomes))
+        best_fitness = [c.fitness for c in statistics.most_fit_genomes]
     avg_fitness = np.array(statistics.get_fitness_mean())
     stdev_fitness = np.array(statistics.get_fitness_stdev())
 
@@ -88,17 +104,21 @@ def plot_spikes(spikes, view=False, filename=None, title=None):
 
 
 def plot_species(statistics, view=False, filename='speciation.svg'):
-    """ Visualizes speciation throughout evolution. """
+    """ Visualizes speciation throughout evolution, from a StatisticsReporter, StatsLog or StatsReporter file. """
     if plt is None:
         warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
         return
 
+    statistics = read_stats(statistics)
     species_sizes = statistics.get_species_sizes()
-    num_generations = len(species_sizes)
+    if isinstance(statistics, StatsLog):
+        generations = statistics.get_generations()
+    else:
+        generations = range(len(species_sizes))
     curves = np.array(species_sizes).T
 
     fig, ax = plt.subplots()
-    ax.stackplot(range(num_generations), *curves)
+    ax.stackplot(generations, *curves)
 
     plt.title("Speciation")
     plt.ylabel("Size per Species")